@@ -0,0 +1,52 @@
+"""
+Micro-benchmark: enum label lookups for a 10k venue listing.
+
+Compares the per-access label computation fyyur.enums used to do (`us.states.lookup` / dict lookup and string
+munging on every access) against the labels cached at import.
+
+    python -m benchmarks.enum_labels
+"""
+import random
+import timeit
+
+from us import states
+
+from fyyur.enums import State, Genre
+
+VENUES = 10000
+REPEAT = 5
+
+
+def uncached_state_label(state):
+    return str(states.lookup(state.name))
+
+
+def uncached_genre_label(genre):
+    return Genre.__labels__.get(genre.value, genre.name.replace('_', ' ').title())
+
+
+def render(state_label, genre_label, venues):
+    # Each listed venue renders its state and genre labels
+    for state, genres in venues:
+        state_label(state)
+        for genre in genres:
+            genre_label(genre)
+
+
+def main():
+    random.seed(0)
+    venues = [(random.choice(list(State)), random.sample(list(Genre), 3)) for _ in range(VENUES)]
+
+    before = min(timeit.repeat(
+        lambda: render(uncached_state_label, uncached_genre_label, venues), number=1, repeat=REPEAT))
+    after = min(timeit.repeat(
+        lambda: render(lambda s: s.label, lambda g: g.label, venues), number=1, repeat=REPEAT))
+
+    print(f'{VENUES} venues, best of {REPEAT}')
+    print(f'  uncached labels: {before * 1000:8.2f} ms/render')
+    print(f'  cached labels:   {after * 1000:8.2f} ms/render')
+    print(f'  speedup:         {before / after:8.1f}x')
+
+
+if __name__ == '__main__':
+    main()
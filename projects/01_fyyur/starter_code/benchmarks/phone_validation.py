@@ -0,0 +1,85 @@
+"""
+Benchmark: GeoValidateUsPhone area code lookup against the previous geodata based implementation.
+
+Reports setup time and memory (merging the phonenumbers geodata vs loading the area code artifact) and
+per-validation latency.
+
+    python -m benchmarks.phone_validation
+"""
+import subprocess
+import sys
+import timeit
+from types import SimpleNamespace
+
+import phonenumbers
+from us import states
+
+from fyyur.enums import State
+from fyyur.validators import GeoValidateUsPhone
+
+NUMBERS = [('415-555-0100', State.CA), ('518-555-0100', State.NY), ('512-555-0100', State.TX),
+           ('305-555-0100', State.FL), ('617-555-0100', State.MA)]
+VALIDATIONS = 5000
+
+LEGACY_SETUP = '''
+from phonenumbers.geodata import data0, data1, data2, data3
+US_PHONE_GEODATA = {}
+for data in [data0, data1, data2, data3]:
+    US_PHONE_GEODATA.update(data.data)
+'''
+
+CURRENT_SETUP = '''
+from fyyur.validators import area_code_states
+area_code_states()
+'''
+
+MEASURE = '''
+import resource, time
+rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+start = time.perf_counter()
+exec({setup!r})
+elapsed = time.perf_counter() - start
+print(elapsed, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - rss)
+'''
+
+
+def measure_setup(setup, preload=''):
+    """Time and peak RSS growth (KiB) of `setup` in a fresh interpreter (so module caches are cold)"""
+    code = preload + MEASURE.format(setup=setup)
+    elapsed, memory = subprocess.check_output([sys.executable, '-c', code]).split()
+    return float(elapsed), int(memory)
+
+
+def legacy_validate(geodata, number, form_state):
+    from phonenumbers.prefix import _prefix_description_for_number
+    phone = phonenumbers.parse(number, 'US')
+    assert phonenumbers.is_valid_number(phone)
+    assert State[states.lookup(_prefix_description_for_number(geodata, 4, phone, 'en')).abbr] == form_state
+
+
+def main():
+    # Import the app first so only the validator setup is measured
+    legacy_setup = measure_setup(LEGACY_SETUP)
+    current_setup = measure_setup(CURRENT_SETUP, preload='import fyyur\n')
+
+    exec(LEGACY_SETUP, namespace := {})
+    geodata = namespace['US_PHONE_GEODATA']
+    legacy = min(timeit.repeat(
+        lambda: [legacy_validate(geodata, number, state) for number, state in NUMBERS],
+        number=VALIDATIONS // len(NUMBERS), repeat=3))
+
+    validator = GeoValidateUsPhone()
+    forms = [(SimpleNamespace(state=SimpleNamespace(data=state.value)), SimpleNamespace(data=number))
+             for number, state in NUMBERS]
+    current = min(timeit.repeat(
+        lambda: [validator(form, field) for form, field in forms],
+        number=VALIDATIONS // len(NUMBERS), repeat=3))
+
+    print(f'{"":24}{"geodata":>12}{"area codes":>12}')
+    print(f'{"setup time (ms)":24}{legacy_setup[0] * 1000:12.1f}{current_setup[0] * 1000:12.1f}')
+    print(f'{"setup RSS (KiB)":24}{legacy_setup[1]:12d}{current_setup[1]:12d}')
+    print(f'{"validation (us)":24}{legacy / VALIDATIONS * 1e6:12.1f}{current / VALIDATIONS * 1e6:12.1f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,398 @@
+"""
+Load benchmark: every fyyur route (HTML controllers and the JSON API) driven through the Flask test client against a
+seeded, synthetic dataset.
+
+Reports p50/p95/p99 latency, queries per request and throughput per route, and stores the results as JSON so runs can
+be compared (--compare). Runs against a dedicated local Postgres database (DB_NAME, default fyyur_bench), which is
+created, migrated and seeded unless --reuse is given. fyyur relies on Postgres features (arrays, upserts, pg_trgm), so
+there is no SQLite stand-in.
+
+    python -m benchmarks.routes --venues 1000 --artists 2000 --shows 20000 --requests 100
+    python -m benchmarks.routes --reuse --compare benchmarks/results/routes-20210410T120000.json
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import re
+import subprocess
+import threading
+import time
+from datetime import datetime, timedelta
+
+os.environ.setdefault('DB_NAME', 'fyyur_bench')
+
+import psycopg2
+from sqlalchemy import event
+
+from fyyur import app, summaries
+from fyyur.cache import page_cache
+from fyyur.enums import State, Genre
+from fyyur.models import db, Venue, Artist, Show, DeleteJob
+from fyyur.validators import area_code_states
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), 'results')
+PERCENTILES = (50, 95, 99)
+CITIES = ('Springfield', 'Riverside', 'Franklin', 'Greenville', 'Fairview')
+
+
+class NullCache(object):
+    """Page cache backend that never hits, so every request renders"""
+
+    def __init__(self, config=None):
+        pass
+
+    def get(self, key):
+        return None
+
+    def set(self, key, value, ttl=None):
+        pass
+
+
+# ----------------------------------------------------------------------------#
+# Dataset.
+# ----------------------------------------------------------------------------#
+
+def create_database():
+    """Create the benchmark database if it does not exist yet, and migrate it"""
+    config = app.config
+    connection = psycopg2.connect(dbname='postgres', user=config['DB_USER'], password=config['DB_PASSWORD'],
+                                  host=config['DB_HOST'], port=config['DB_PORT'])
+    connection.autocommit = True
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT 1 FROM pg_database WHERE datname = %s', [config['DB_NAME']])
+        if cursor.fetchone() is None:
+            cursor.execute(f'CREATE DATABASE "{config["DB_NAME"]}"')
+    connection.close()
+
+    from flask_migrate import upgrade
+    upgrade()
+
+
+def phone_numbers():
+    """A valid phone number for every state that has an area code"""
+    numbers = {}
+    for area_code, state in sorted(area_code_states().items()):
+        numbers.setdefault(state, f'{area_code}-555-01{len(numbers) % 100:02d}')
+    return numbers
+
+
+def _entity_rows(kind, count, phones, rng):
+    states = [state for state in State if state in phones]
+    rows = []
+    for n in range(count):
+        state = states[n % len(states)]  # Spread entities over every state
+        rows.append({
+            'name': f'{kind} {n} {rng.choice(CITIES)}',
+            'city': rng.choice(CITIES),
+            'state': state,
+            'phone': phones[state],
+            'genres': rng.sample(list(Genre), rng.randint(1, 3)),
+            'image_link': f'https://example.com/{kind.lower()}/{n}.png',
+            'seeking_description': None,
+            ('seeking_talent' if kind == 'Venue' else 'seeking_venue'): rng.random() < 0.3,
+            **({'address': f'{n} Main Street'} if kind == 'Venue' else {}),
+        })
+    return rows
+
+
+def seed(venues, artists, shows, spare, rng):
+    """
+    Replace the benchmark data with `venues`, `artists` and `shows` spread over the last and next year.
+    `spare` extra venues and artists without shows are created for the delete routes.
+    """
+    phones = phone_numbers()
+    db.session.execute('TRUNCATE show, venue, artist, delete_job RESTART IDENTITY CASCADE')
+    db.session.execute(Venue.__table__.insert(), _entity_rows('Venue', venues + spare, phones, rng))
+    db.session.execute(Artist.__table__.insert(), _entity_rows('Artist', artists + spare, phones, rng))
+
+    now = datetime.now()
+    db.session.execute(Show.__table__.insert(), [{
+        'venue_id': rng.randint(1, venues),
+        'artist_id': rng.randint(1, artists),
+        'start_time': now + timedelta(minutes=rng.randint(-525600, 525600)),
+    } for _ in range(shows)])
+
+    summaries.refresh(summaries.VENUE, range(1, venues + spare + 1))
+    summaries.refresh(summaries.ARTIST, range(1, artists + spare + 1))
+    db.session.commit()
+
+
+def entity_ids(summary, spare):
+    """(ids of entities with shows, ids of up to `spare` entities without shows to delete)"""
+    model, key, _, entity = summary
+    rows = db.session.query(entity.id, model.upcoming_shows + model.past_shows) \
+        .outerjoin(model, key == entity.id).order_by(entity.id).all()
+    empty = [entity_id for entity_id, shows in rows if not shows]
+    return [entity_id for entity_id, shows in rows if shows], empty[-spare:]
+
+
+def delete_job_id():
+    """Id of a delete job for the job status route, a finished job is recorded if there is none"""
+    job = DeleteJob.query.order_by(DeleteJob.id).first()
+    if job is None:
+        job = DeleteJob(kind='venue', entity_id=0, status='done', finished_at=datetime.now())
+        db.session.add(job)
+        db.session.commit()
+    return job.id
+
+
+# ----------------------------------------------------------------------------#
+# Routes.
+# ----------------------------------------------------------------------------#
+
+def routes(venue_ids, artist_ids, spare_venue_ids, spare_artist_ids, phones, job_id, rng):
+    """(name, method, url, form data factory) for every route, write routes last. Spare entities are deleted."""
+    today = datetime.today().date()
+    venue_id = lambda: rng.choice(venue_ids)
+    artist_id = lambda: rng.choice(artist_ids)
+    spare_venues, spare_artists = iter(spare_venue_ids), iter(spare_artist_ids)
+    state = State.CA if State.CA in phones else next(iter(phones))
+
+    def entity_form(kind):
+        return lambda: {
+            'name': f'Benchmark {kind} {rng.randint(0, 10 ** 6)}', 'city': rng.choice(CITIES), 'state': state.value,
+            'address': '1 Main Street', 'phone': phones[state], 'genres': [Genre.JAZZ.value, Genre.SOUL.value],
+        }
+
+    def show_form():
+        return {'venue_id': venue_id(), 'artist_id': artist_id(),
+                'start_time': (datetime.now() + timedelta(days=30)).strftime('%Y-%m-%d %H:%M:%S')}
+
+    return [
+        ('index', 'GET', lambda: '/', None),
+        ('list_venues', 'GET', lambda: '/venues', None),
+        ('show_venue', 'GET', lambda: f'/venues/{venue_id()}', None),
+        ('search_venues', 'POST', lambda: '/venues/search', lambda: {'search_term': rng.choice(CITIES)[:4]}),
+        ('browse_venues', 'GET', lambda: f'/venues/browse?genre={rng.choice(list(Genre)).value}', None),
+        ('list_artists', 'GET', lambda: '/artists', None),
+        ('show_artist', 'GET', lambda: f'/artists/{artist_id()}', None),
+        ('search_artists', 'POST', lambda: '/artists/search', lambda: {'search_term': rng.choice(CITIES)[:4]}),
+        ('browse_artists', 'GET', lambda: f'/artists/browse?state={rng.choice(list(phones)).value}', None),
+        ('list_shows', 'GET', lambda: '/shows', None),
+        ('shows_calendar', 'GET', lambda: f'/shows/calendar?start={today}&end={today + timedelta(days=30)}', None),
+        ('create_venue_form', 'GET', lambda: '/venues/create', None),
+        ('edit_venue_form', 'GET', lambda: f'/venues/{venue_id()}/edit', None),
+        ('create_artist_form', 'GET', lambda: '/artists/create', None),
+        ('edit_artist_form', 'GET', lambda: f'/artists/{artist_id()}/edit', None),
+        ('create_show_form', 'GET', lambda: '/shows/create', None),
+        ('metrics_cache', 'GET', lambda: '/metrics/cache', None),
+        ('metrics_db', 'GET', lambda: '/metrics/db', None),
+        ('delete_job_status', 'GET', lambda: f'/delete-jobs/{job_id}', None),
+        ('api_areas', 'GET', lambda: '/api/v1/areas', None),
+        ('api_venues', 'GET', lambda: '/api/v1/venues', None),
+        ('api_venue', 'GET', lambda: f'/api/v1/venues/{venue_id()}', None),
+        ('api_artists', 'GET', lambda: '/api/v1/artists', None),
+        ('api_artist', 'GET', lambda: f'/api/v1/artists/{artist_id()}', None),
+        ('api_shows', 'GET', lambda: '/api/v1/shows', None),
+        ('api_shows_calendar', 'GET',
+         lambda: f'/api/v1/shows/calendar?start={today}&end={today + timedelta(days=30)}', None),
+        ('api_search_venues', 'GET', lambda: f'/api/v1/venues/search?search_term={rng.choice(CITIES)[:4]}', None),
+        ('api_search_artists', 'GET', lambda: f'/api/v1/artists/search?search_term={rng.choice(CITIES)[:4]}', None),
+        ('create_venue', 'POST', lambda: '/venues/create', entity_form('Venue')),
+        ('edit_venue', 'POST', lambda: f'/venues/{venue_id()}/edit', entity_form('Venue')),
+        ('create_artist', 'POST', lambda: '/artists/create', entity_form('Artist')),
+        ('edit_artist', 'POST', lambda: f'/artists/{artist_id()}/edit', entity_form('Artist')),
+        ('create_show', 'POST', lambda: '/shows/create', show_form),
+        ('delete_venue', 'DELETE', lambda: f'/venues/{next(spare_venues, 0)}', None),
+        ('delete_artist', 'DELETE', lambda: f'/artists/{next(spare_artists, 0)}', None),
+    ]
+
+
+# ----------------------------------------------------------------------------#
+# Measurement.
+# ----------------------------------------------------------------------------#
+
+class QueryCounter(object):
+    """Count the statements each thread executes, on every engine (primary and replicas)"""
+
+    def __init__(self):
+        self._local = threading.local()
+        for bind in [None] + list(app.config.get('SQLALCHEMY_BINDS') or ()):
+            event.listen(db.get_engine(app, bind=bind), 'before_cursor_execute', self._count)
+
+    def _count(self, *args):
+        self._local.count = getattr(self._local, 'count', 0) + 1
+
+    def reset(self):
+        self._local.count = 0
+
+    @property
+    def count(self):
+        return getattr(self._local, 'count', 0)
+
+
+def percentile(values, p):
+    """Nearest-rank percentile of sorted values"""
+    return values[max(0, min(len(values) - 1, round(p / 100 * len(values) + 0.5) - 1))]
+
+
+def summarize(latencies, queries, elapsed, errors):
+    latencies = sorted(latencies)
+    if not latencies:
+        return {'requests': 0, 'errors': errors}
+    return {
+        'requests': len(latencies),
+        'errors': errors,
+        'throughput_rps': len(latencies) / elapsed if elapsed else 0.0,
+        'mean_ms': sum(latencies) / len(latencies) * 1000,
+        **{f'p{p}_ms': percentile(latencies, p) * 1000 for p in PERCENTILES},
+        'max_ms': latencies[-1] * 1000,
+        'queries_mean': sum(queries) / len(queries),
+        'queries_max': max(queries),
+    }
+
+
+def facet_total(page):
+    """Sum of the facet counts of a browse page, which only shrinks when the listing is filtered"""
+    return sum(int(count) for count in re.findall(r'<span class="badge">(\d+)</span>', page))
+
+
+def check_filtered(route):
+    """Fail unless the filter of a browse route is applied, i.e. matches fewer entities than the unfiltered page"""
+    name, _, url, _ = route
+    client = app.test_client()
+    filtered_url = url()
+    filtered = facet_total(client.get(filtered_url).get_data(as_text=True))
+    unfiltered = facet_total(client.get(filtered_url.split('?')[0]).get_data(as_text=True))
+    if not filtered < unfiltered:
+        raise SystemExit(f'{name}: {filtered_url} is not filtered ({filtered} vs {unfiltered} unfiltered facet counts)')
+
+
+def csrf_token(client):
+    """CSRF token of the client's session, as rendered into the create forms"""
+    page = client.get('/venues/create').get_data(as_text=True)
+    return re.search(r'name="csrf_token" type="hidden" value="([^"]+)"', page).group(1)
+
+
+def run_route(route, requests, concurrency, counter):
+    name, method, url, data = route
+    latencies, queries, errors = [], [], []
+    lock = threading.Lock()
+    remaining = iter(range(requests))
+
+    def worker():
+        client = app.test_client()
+        token = csrf_token(client) if method == 'POST' else None
+        while True:
+            with lock:
+                if next(remaining, None) is None:
+                    return
+                request_url, form = url(), data() if data else None  # Factories share one RNG
+            if form is not None:
+                form['csrf_token'] = token
+            counter.reset()
+            start = time.perf_counter()
+            response = client.open(request_url, method=method, data=form)
+            latency = time.perf_counter() - start
+            with lock:
+                latencies.append(latency)
+                queries.append(counter.count)
+                if response.status_code >= 400:
+                    errors.append(response.status_code)
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return summarize(latencies, queries, time.perf_counter() - start, len(errors))
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline_path):
+    with open(baseline_path) as f:
+        baseline = json.load(f)['routes']
+    print(f'\nCompared to {baseline_path} (p50 / p95 ms, queries per request)')
+    for name, stats in results.items():
+        before = baseline.get(name)
+        if before is None:
+            continue
+        print(f'  {name:22} p50 {before["p50_ms"]:8.2f} -> {stats["p50_ms"]:8.2f}   '
+              f'p95 {before["p95_ms"]:8.2f} -> {stats["p95_ms"]:8.2f}   '
+              f'queries {before["queries_mean"]:5.1f} -> {stats["queries_mean"]:5.1f}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--venues', type=int, default=1000)
+    parser.add_argument('--artists', type=int, default=2000)
+    parser.add_argument('--shows', type=int, default=20000)
+    parser.add_argument('--requests', type=int, default=100, help='Requests per route')
+    parser.add_argument('--concurrency', type=int, default=1, help='Client threads per route')
+    parser.add_argument('--page-cache', action='store_true', help='Keep the page cache (default: every request renders)')
+    parser.add_argument('--reuse', action='store_true', help='Benchmark the existing data instead of reseeding')
+    parser.add_argument('--seed', type=int, default=0, help='Random seed of the dataset and requests')
+    parser.add_argument('--only', nargs='*', help='Route names to run')
+    parser.add_argument('--output', help='Results file (default: benchmarks/results/routes-<timestamp>.json)')
+    parser.add_argument('--compare', help='Results file of an earlier run to compare with')
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    app.config['PROPAGATE_EXCEPTIONS'] = False  # Count failing requests as 500s
+    if not args.page_cache:
+        page_cache.backend = NullCache()
+
+    with app.app_context():
+        if not args.reuse:
+            create_database()
+            start = time.perf_counter()
+            seed(args.venues, args.artists, args.shows, args.requests, rng)
+            print(f'Seeded {args.venues} venues, {args.artists} artists, {args.shows} shows '
+                  f'in {time.perf_counter() - start:.1f}s')
+        phones = phone_numbers()
+        venue_ids, spare_venue_ids = entity_ids(summaries.VENUE, args.requests)
+        artist_ids, spare_artist_ids = entity_ids(summaries.ARTIST, args.requests)
+        job_id = delete_job_id()
+        dataset = {'venues': len(venue_ids), 'artists': len(artist_ids), 'shows': Show.query.count()}
+        db.session.remove()
+
+    counter = QueryCounter()
+    results = {}
+    print(f'{args.requests} requests per route, concurrency {args.concurrency}')
+    print(f'  {"route":22} {"p50":>8} {"p95":>8} {"p99":>8} {"req/s":>8} {"queries":>8}')
+    for route in routes(venue_ids, artist_ids, spare_venue_ids, spare_artist_ids, phones, job_id, rng):
+        if args.only and route[0] not in args.only:
+            continue
+        if route[0].startswith('browse_'):
+            check_filtered(route)
+        stats = results[route[0]] = run_route(route, args.requests, args.concurrency, counter)
+        print(f'  {route[0]:22} {stats["p50_ms"]:8.2f} {stats["p95_ms"]:8.2f} {stats["p99_ms"]:8.2f} '
+              f'{stats["throughput_rps"]:8.1f} {stats["queries_mean"]:8.1f}'
+              + (f'  ({stats["errors"]} errors)' if stats['errors'] else ''))
+
+    run = {
+        'meta': {
+            'timestamp': datetime.utcnow().isoformat(timespec='seconds'),
+            'git_revision': git_revision(),
+            'python': platform.python_version(),
+            'database': app.config['DB_NAME'],
+            'dataset': dataset,
+            'requests': args.requests,
+            'concurrency': args.concurrency,
+            'page_cache': args.page_cache,
+            'seed': args.seed,
+        },
+        'routes': results,
+    }
+    output = args.output or os.path.join(
+        RESULTS_DIR, f'routes-{datetime.utcnow().strftime("%Y%m%dT%H%M%S")}.json')
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(run, f, indent=2)
+    print(f'\nWrote {output}')
+
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == '__main__':
+    main()
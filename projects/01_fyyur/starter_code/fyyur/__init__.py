@@ -1,11 +1,10 @@
 import os
 
-import babel
-import dateutil.parser
 from flask import Flask
 from flask_moment import Moment
 
 from fyyur.config import DevConfig
+from .formatting import format_datetime, format_datetimes
 from .utils import env
 
 # ----------------------------------------------------------------------------#
@@ -19,7 +18,14 @@ if DEBUG:
 else:
     app.config.from_object('fyyur.config.ProdConfig')
 
+if not app.config['SECRET_KEY']:
+    raise RuntimeError('SECRET_KEY must be set, it has to be the same for every worker process')
+
 import fyyur.controllers
+import fyyur.sessions  # Server-side session store
+from fyyur.api import api as api_bp
+app.register_blueprint(api_bp)
+import fyyur.importer  # Registers the import-data CLI command
 
 moment = Moment(app)
 
@@ -28,21 +34,8 @@ moment = Moment(app)
 # Filters.
 # ----------------------------------------------------------------------------#
 
-def format_datetime(value, format='medium'):
-    # Allow datetime objects
-    if isinstance(value, str):
-        date = dateutil.parser.parse(value)
-    else:
-        date = value
-
-    if format == 'full':
-        format = "EEEE MMMM, d, y 'at' h:mma"
-    elif format == 'medium':
-        format = "EE MM, dd, y h:mma"
-    return babel.dates.format_datetime(date, format)
-
-
 app.jinja_env.filters['datetime'] = format_datetime
+app.jinja_env.filters['datetimes'] = format_datetimes
 
 # ----------------------------------------------------------------------------#
 # Launch.
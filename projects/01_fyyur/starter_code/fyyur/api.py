@@ -0,0 +1,190 @@
+"""
+Versioned, read only JSON API (/api/v1) over the same queries as the HTML controllers.
+
+Payloads are cached in the page cache under the same namespaces as the pages they mirror, so the write paths'
+invalidations apply to both. Responses carry a strong ETag (hash of the payload) and the Last-Modified time of the
+render, and conditional GETs (If-None-Match / If-Modified-Since) are answered with 304 Not Modified.
+"""
+import hashlib
+import json
+import time
+from datetime import date, datetime, timezone
+from functools import wraps
+
+from flask import Blueprint, request, abort, jsonify
+
+from fyyur import app
+from . import enums, pagination, queries, search
+from .cache import page_cache
+from .models import Venue, Artist, Show
+
+api = Blueprint('api', __name__, url_prefix='/api/v1')
+
+
+def _jsonable(value):
+    """Convert query results into JSON types: enums by label, datetimes as ISO 8601, private attributes dropped"""
+    if isinstance(value, dict):
+        return {key: _jsonable(item) for key, item in value.items() if not key.startswith('_')}
+    if isinstance(value, (list, tuple)):
+        return [_jsonable(item) for item in value]
+    if isinstance(value, enums.ChoiceEnum):
+        return value.label
+    if isinstance(value, date):
+        return value.isoformat()
+    return value
+
+
+def _render(payload):
+    body = json.dumps(_jsonable(payload), separators=(',', ':'))
+    return body, hashlib.sha1(body.encode()).hexdigest(), datetime.now(timezone.utc).replace(microsecond=0)
+
+
+def cached_json(namespace):
+    """
+    Serve the payload returned by a view as a cached, conditional JSON response, e.g. @cached_json('venue:{venue_id}').
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(**kwargs):
+            ns = namespace.format(**kwargs)
+            key = f'json:{ns}:{page_cache.version(ns)}:{request.full_path}'
+            entry = page_cache.backend.get(key)
+            if entry is not None:
+                page_cache.record_hit()
+            else:
+                start = time.perf_counter()
+                entry = _render(view(**kwargs))
+                page_cache.record_miss(time.perf_counter() - start)
+                page_cache.backend.set(key, entry, page_cache.ttl)
+
+            body, etag, last_modified = entry
+            response = app.response_class(body, mimetype='application/json')
+            response.set_etag(etag)
+            response.last_modified = last_modified
+            response.cache_control.public = True
+            response.cache_control.max_age = app.config['API_CACHE_MAX_AGE']
+            return response.make_conditional(request)
+        return wrapper
+    return decorator
+
+
+def _keyset_page(page, serialize):
+    return {
+        'items': [serialize(item) for item in page],
+        'next_cursor': page.next_cursor,
+        'prev_cursor': page.prev_cursor,
+    }
+
+
+def _search_page(results):
+    return {
+        'search_term': results.term,
+        'page': results.page,
+        'total': results.total,
+        'total_capped': results.total_capped,
+        'has_next': results.has_next,
+        'items': [{'id': item.id, 'name': item.name} for item in results],
+    }
+
+
+def _show(show):
+    return {
+        'id': show.id,
+        'start_time': show.start_time,
+        'venue': {'id': show.venue.id, 'name': show.venue.name, 'image_link': show.venue.image_link},
+        'artist': {'id': show.artist.id, 'name': show.artist.name, 'image_link': show.artist.image_link},
+    }
+
+
+def _paginate(query, columns):
+    """Keyset page of `query` at the request's after/before cursor, 400 for malformed cursors"""
+    try:
+        return pagination.keyset_paginate(query, columns, after=request.args.get('after'),
+                                          before=request.args.get('before'))
+    except ValueError:
+        abort(400)
+
+
+#  Venues
+#  ----------------------------------------------------------------
+
+@api.route('/areas')
+@cached_json('venues')
+def list_areas():
+    return {'areas': queries.venue_areas()}
+
+
+@api.route('/venues')
+@cached_json('venues')
+def list_venues():
+    venues = _paginate(Venue.query.with_entities(Venue.id, Venue.name, Venue.city, Venue.state), [Venue.name, Venue.id])
+    return _keyset_page(venues, lambda venue: venue._asdict())
+
+
+@api.route('/venues/<int:venue_id>')
+@cached_json('venue:{venue_id}')
+def show_venue(venue_id):
+    return queries.venue_detail(venue_id) or abort(404)
+
+
+@api.route('/venues/search')
+@cached_json('venues')
+def search_venues():
+    return _search_page(search.search_names(Venue, request.args.get('search_term', ''),
+                                            request.args.get('page', 1, type=int)))
+
+
+#  Artists
+#  ----------------------------------------------------------------
+
+@api.route('/artists')
+@cached_json('artists')
+def list_artists():
+    artists = _paginate(
+        Artist.query.with_entities(Artist.id, Artist.name, Artist.city, Artist.state), [Artist.name, Artist.id]
+    )
+    return _keyset_page(artists, lambda artist: artist._asdict())
+
+
+@api.route('/artists/<int:artist_id>')
+@cached_json('artist:{artist_id}')
+def show_artist(artist_id):
+    return queries.artist_detail(artist_id) or abort(404)
+
+
+@api.route('/artists/search')
+@cached_json('artists')
+def search_artists():
+    return _search_page(search.search_names(Artist, request.args.get('search_term', ''),
+                                            request.args.get('page', 1, type=int)))
+
+
+#  Shows
+#  ----------------------------------------------------------------
+
+@api.route('/shows')
+@cached_json('shows')
+def list_shows():
+    # Only list upcoming shows
+    shows = _paginate(Show.query.filter(Show.start_time > datetime.now()), [Show.start_time, Show.id])
+    return _keyset_page(shows, _show)
+
+
+@api.route('/shows/calendar')
+@cached_json('shows')
+def shows_calendar():
+    try:
+        start, end, state = queries.calendar_filters(request.args, app.config['CALENDAR_MAX_DAYS'])
+    except ValueError:
+        abort(400)
+    shows = _paginate(queries.shows_between(start, end, state), [Show.start_time, Show.id])
+    return {'start': start, 'end': end, 'state': state, **_keyset_page(shows, _show)}
+
+
+#  Errors
+#  ----------------------------------------------------------------
+
+@api.errorhandler(400)
+@api.errorhandler(404)
+def api_error(error):
+    return jsonify({'success': False, 'error': error.code, 'message': error.description}), error.code
@@ -0,0 +1,167 @@
+"""
+Rendered page cache with write-through invalidation.
+
+Pages are cached under a namespace (e.g. 'venues', 'venue:1') plus the request path and query string. Each
+namespace has a version token that is part of the key, so invalidating a namespace only replaces its token and the
+stale entries age out of the backend. Invalidations are queued on the SQLAlchemy session and applied when it commits,
+so a rolled back transaction leaves the cache untouched.
+
+The default backend is an in-process LRU, another backend can be configured with PAGE_CACHE_BACKEND (dotted path to a
+class taking the app config, with `get(key)` and `set(key, value, ttl=None)`).
+"""
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from functools import wraps
+from importlib import import_module
+
+from flask import request, session as flask_session, jsonify
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from fyyur import app
+from .models import Show
+from .queries import partner_ids
+
+
+class LRUCache(object):
+    """Thread safe in-process LRU with per entry expiry"""
+
+    def __init__(self, config):
+        self.maxsize = config['PAGE_CACHE_MAX_ENTRIES']
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires = entry
+            if expires is not None and expires < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + ttl if ttl else None)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+
+class PageCache(object):
+    def __init__(self, backend, ttl):
+        self.backend = backend
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.render_seconds = 0.0
+        self._lock = threading.Lock()
+
+    def record_hit(self):
+        with self._lock:
+            self.hits += 1
+
+    def record_miss(self, render_seconds):
+        with self._lock:
+            self.misses += 1
+            self.render_seconds += render_seconds
+
+    def version(self, namespace):
+        key = f'version:{namespace}'
+        token = self.backend.get(key)
+        if token is None:
+            # Unknown or evicted namespace, a fresh token can never match a stale entry
+            token = uuid.uuid4().hex
+            self.backend.set(key, token)
+        return token
+
+    def invalidate(self, *namespaces):
+        for namespace in namespaces:
+            self.backend.set(f'version:{namespace}', uuid.uuid4().hex)
+
+    def metrics(self):
+        with self._lock:
+            hits, misses, render_seconds = self.hits, self.misses, self.render_seconds
+        requests = hits + misses
+        return {
+            'hits': hits,
+            'misses': misses,
+            'hit_rate': hits / requests if requests else 0.0,
+            'avg_render_ms': render_seconds / misses * 1000 if misses else 0.0,
+        }
+
+
+def _load_backend(config):
+    module, _, name = config['PAGE_CACHE_BACKEND'].rpartition('.')
+    return getattr(import_module(module), name)(config)
+
+
+page_cache = PageCache(_load_backend(app.config), app.config['PAGE_CACHE_TTL'])
+
+
+def cached_page(namespace):
+    """
+    Cache the rendered output of a GET view under `namespace`, formatted with the view arguments,
+    e.g. @cached_page('venue:{venue_id}').
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(**kwargs):
+            # Pages carrying flashed messages are one-off renders
+            if request.method != 'GET' or '_flashes' in flask_session:
+                return view(**kwargs)
+
+            ns = namespace.format(**kwargs)
+            key = f'page:{ns}:{page_cache.version(ns)}:{request.full_path}'
+            page = page_cache.backend.get(key)
+            if page is not None:
+                page_cache.record_hit()
+                return page
+
+            start = time.perf_counter()
+            page = view(**kwargs)
+            page_cache.record_miss(time.perf_counter() - start)
+            if isinstance(page, str):
+                page_cache.backend.set(key, page, page_cache.ttl)
+            return page
+        return wrapper
+    return decorator
+
+
+def invalidate_on_commit(session, *namespaces):
+    """Queue cache invalidations to be applied once `session` commits"""
+    session.info.setdefault('cache_invalidations', set()).update(namespaces)
+
+
+# Venue and artist details are rendered on each other's pages and on the shows listing
+
+def invalidate_venue(session, venue_id):
+    artist_ids = partner_ids(Show.venue_id, Show.artist_id, venue_id)
+    invalidate_on_commit(session, 'venues', 'shows', f'venue:{venue_id}',
+                         *[f'artist:{artist_id}' for artist_id in artist_ids])
+
+
+def invalidate_artist(session, artist_id):
+    venue_ids = partner_ids(Show.artist_id, Show.venue_id, artist_id)
+    invalidate_on_commit(session, 'artists', 'shows', f'artist:{artist_id}',
+                         *[f'venue:{venue_id}' for venue_id in venue_ids])
+
+
+@event.listens_for(Session, 'after_commit')
+def _apply_invalidations(session):
+    page_cache.invalidate(*session.info.pop('cache_invalidations', ()))
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_invalidations(session):
+    session.info.pop('cache_invalidations', None)
+
+
+@app.route('/metrics/cache')
+def cache_metrics():
+    return jsonify(page_cache.metrics())
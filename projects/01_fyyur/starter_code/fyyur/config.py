@@ -1,4 +1,8 @@
 import os
+import tempfile
+
+from replica_routing import replica_binds
+
 from .utils import env
 
 # Grabs the folder where the script runs.
@@ -6,7 +10,8 @@ basedir = os.path.abspath(os.path.dirname(__file__))
 
 
 class Config(object):
-    SECRET_KEY = os.urandom(32)
+    # Must be the same for every worker process, it signs session cookies and CSRF tokens
+    SECRET_KEY = env('SECRET_KEY')
     DEBUG = False
     TESTING = False
 
@@ -21,9 +26,61 @@ class Config(object):
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     SQLALCHEMY_DATABASE_URI = f'postgresql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}'
 
+    # Read replicas, see replica_routing
+    SQLALCHEMY_BINDS = replica_binds(env('DB_REPLICA_URIS', default=''))
+    REPLICA_LAG_WINDOW = int(env('REPLICA_LAG_WINDOW', default=5))  # Seconds a client reads from the primary after a write
+    REPLICA_HEALTH_INTERVAL = int(env('REPLICA_HEALTH_INTERVAL', default=10))  # Seconds between replica health checks
+    REPLICA_MAX_LAG = int(env('REPLICA_MAX_LAG', default=30))  # Seconds of replay lag before a replica is skipped
+
+    # Server-side sessions, see fyyur.sessions
+    SESSION_BACKEND = env('SESSION_BACKEND', default='fyyur.sessions.FilesystemSessionStore')
+    SESSION_FILE_DIR = env('SESSION_FILE_DIR', default=os.path.join(tempfile.gettempdir(), 'fyyur-sessions'))
+    SESSION_COOKIE_SAMESITE = 'Lax'
+
+    # Connection pool
+    DB_POOL_SIZE = int(env('DB_POOL_SIZE', default=10))
+    DB_MAX_OVERFLOW = int(env('DB_MAX_OVERFLOW', default=20))
+    DB_POOL_TIMEOUT = int(env('DB_POOL_TIMEOUT', default=10))  # Seconds to wait for a free connection
+    DB_POOL_RECYCLE = int(env('DB_POOL_RECYCLE', default=1800))  # Seconds, replaces connections before server timeouts
+    DB_POOL_PRE_PING = env('DB_POOL_PRE_PING', default='true').lower() == 'true'
+    DB_STATEMENT_TIMEOUT = int(env('DB_STATEMENT_TIMEOUT', default=30000))  # Milliseconds, 0 disables the timeout
+    SQLALCHEMY_ENGINE_OPTIONS = {
+        'pool_size': DB_POOL_SIZE,
+        'max_overflow': DB_MAX_OVERFLOW,
+        'pool_timeout': DB_POOL_TIMEOUT,
+        'pool_recycle': DB_POOL_RECYCLE,
+        'pool_pre_ping': DB_POOL_PRE_PING,
+        'connect_args': {'options': f'-c statement_timeout={DB_STATEMENT_TIMEOUT}'},
+    }
+
+    # Pagination
+    LIST_RESULTS_PER_PAGE = int(env('LIST_RESULTS_PER_PAGE', default=50))
+    CALENDAR_MAX_DAYS = int(env('CALENDAR_MAX_DAYS', default=92))  # Widest date range of the shows calendar
+
+    # Page cache
+    PAGE_CACHE_BACKEND = env('PAGE_CACHE_BACKEND', default='fyyur.cache.LRUCache')
+    PAGE_CACHE_MAX_ENTRIES = int(env('PAGE_CACHE_MAX_ENTRIES', default=1024))
+    PAGE_CACHE_TTL = int(env('PAGE_CACHE_TTL', default=300))  # Seconds, bounds staleness of time dependent pages
+
+    # JSON API
+    API_CACHE_MAX_AGE = int(env('API_CACHE_MAX_AGE', default=0))  # Seconds clients/CDNs may reuse without revalidating
+
+    # Deletion
+    DELETE_ASYNC_THRESHOLD = int(env('DELETE_ASYNC_THRESHOLD', default=1000))  # Shows above which deletes run as a job
+    DELETE_BATCH_SIZE = int(env('DELETE_BATCH_SIZE', default=1000))  # Shows deleted per transaction by a delete job
+    DELETE_JOB_WORKERS = int(env('DELETE_JOB_WORKERS', default=2))
+
+    # Bulk import
+    IMPORT_CHUNK_SIZE = int(env('IMPORT_CHUNK_SIZE', default=1000))
+
+    # Search
+    SEARCH_RESULTS_PER_PAGE = int(env('SEARCH_RESULTS_PER_PAGE', default=20))
+    SEARCH_COUNT_LIMIT = int(env('SEARCH_COUNT_LIMIT', default=1000))
+
 
 class DevConfig(Config):
     DEBUG = True
+    SECRET_KEY = env('SECRET_KEY', default='fyyur-development-key')
     ENV = 'development'
 
 
@@ -10,6 +10,7 @@ from flask_wtf.csrf import CSRFError
 
 from .forms import *
 from .models import *
+from . import cache, deletion, facets, pagination, queries, search, summaries
 
 
 # ----------------------------------------------------------------------------#
@@ -21,35 +22,32 @@ def index():
     return render_template('pages/home.html')
 
 
+def deleted(name, job_id):
+    """Response to a DELETE request, 202 with the job status URL when the deletion runs in the background"""
+    if job_id is None:
+        flash(name + ' was successfully deleted!', 'alert-success')
+        return jsonify({'success': True})
+
+    flash(name + ' is being deleted.', 'alert-info')
+    return jsonify({'success': True, 'job_id': job_id,
+                    'status_url': url_for('delete_job_status', job_id=job_id)}), 202
+
+
+def keyset_page(query, columns):
+    """Keyset page of `query` at the request's after/before cursor, 400 for malformed cursors"""
+    try:
+        return pagination.keyset_paginate(query, columns, after=request.args.get('after'),
+                                          before=request.args.get('before'))
+    except ValueError:
+        abort(400)
+
+
 #  Venues
 #  ----------------------------------------------------------------
 @app.route('/venues')
+@cache.cached_page('venues')
 def list_venues():
-    # Find unique combinations of states existing in database
-    distinct_states = db.session.query(Venue).distinct(Venue.state) \
-        .with_entities(Venue.state) \
-        .order_by(Venue.state).all()
-
-    # Compile context
-    # Loop by state to avoid excessive db hits with unique (state, city) combos
-    data = []
-    for state, in distinct_states:
-        venues = Venue.query.filter_by(state=state).order_by(Venue.city)
-        cities = {}
-        for venue in venues:
-            if venue.city not in cities:
-                cities[venue.city] = {
-                    'city': venue.city,
-                    'state': venue.state.label,
-                    'venues': []
-                }
-
-            cities[venue.city]['venues'].append({
-                'id': venue.id,
-                'name': venue.name,
-                'num_upcoming_shows': 1  # TODO: Implement
-            })
-        data.extend(cities.values())
+    data = queries.venue_areas()
     return render_template('pages/venues.html', areas=data)
 
 
@@ -66,6 +64,7 @@ def create_venue():
                     venue = Venue()
                     form.populate_obj(venue)
                     session.add(venue)
+                    cache.invalidate_on_commit(session, 'venues')
             except Exception:
                 success_msg = ['Failed to add Venue ' + request.form['name'] + '!', 'alert-danger']
         else:
@@ -79,26 +78,9 @@ def create_venue():
 
 
 @app.route('/venues/<int:venue_id>')
+@cache.cached_page('venue:{venue_id}')
 def show_venue(venue_id):
-    venue = Venue.query.get(venue_id) or abort(404)
-
-    # Join query for venue shows, extract artist and show details
-    """
-    --- Join query ---
-    # SELECT * FROM show LEFT OUTER JOIN venue ON venue.id = show.venue_id;
-    """
-    shows = Show.query.join(Venue).filter(Show.venue_id == venue_id)
-
-    past_shows = shows.filter(Show.start_time <= datetime.now())
-    upcoming_shows = shows.filter(Show.start_time > datetime.now())
-
-    context = {
-        **venue.__dict__,
-        'past_shows': past_shows.all(),
-        'upcoming_shows': upcoming_shows.all(),
-        'past_shows_count': past_shows.count(),
-        'upcoming_shows_count': upcoming_shows.count(),
-    }
+    context = queries.venue_detail(venue_id) or abort(404)
     return render_template('pages/show_venue.html', venue=context)
 
 
@@ -111,6 +93,7 @@ def edit_venue(venue_id):
         with db_session() as session:
             form.populate_obj(venue)
             session.add(venue)
+            cache.invalidate_venue(session, venue_id)
         return redirect(url_for('show_venue', venue_id=venue_id))
 
     return render_template('forms/change_venue.html', form=form, venue=venue)
@@ -121,29 +104,33 @@ def delete_venue(venue_id):
     venue = Venue.query.get(venue_id) or abort(404)
 
     try:
-        with db_session() as session:
-            session.delete(venue)
+        job_id = deletion.delete_entity('venue', venue.id)
     except Exception:
         abort(404)
 
-    flash('Venue was successfully deleted!', 'alert-success')
-    return jsonify({'success': True})
+    return deleted('Venue', job_id)
 
 
-@app.route('/venues/search', methods=['POST'])
+@app.route('/venues/search', methods=['GET', 'POST'])
 def search_venues():
-    search_term = request.form.get('search_term', '')
-    venues = Venue.query.filter(Venue.name.ilike(f'%{search_term}%'))
+    search_term = request.values.get('search_term', '')
+    page = request.values.get('page', 1, type=int)
+    venues = search.search_names(Venue, search_term, page)
 
-    return render_template('pages/search_venues.html', venues=venues,
-                           search_term=request.form.get('search_term', ''))
+    return render_template('pages/search_venues.html', venues=venues, search_term=search_term)
+
+
+@app.route('/venues/browse')
+def browse_venues():
+    return browse(facets.VENUES, 'Venues')
 
 
 #  Artists
 #  ----------------------------------------------------------------
 @app.route('/artists')
+@cache.cached_page('artists')
 def list_artists():
-    artists = Artist.query.order_by(Artist.name).with_entities(Artist.id, Artist.name)
+    artists = keyset_page(Artist.query.with_entities(Artist.id, Artist.name), [Artist.name, Artist.id])
     return render_template('pages/artists.html', artists=artists)
 
 
@@ -160,6 +147,7 @@ def create_artist():
                     artist = Artist()
                     form.populate_obj(artist)
                     session.add(artist)
+                    cache.invalidate_on_commit(session, 'artists')
             except Exception as exc:
                 success_msg = ['Failed to add Artist ' + request.form['name'] + '!', 'alert-danger']
         else:
@@ -173,26 +161,9 @@ def create_artist():
 
 
 @app.route('/artists/<int:artist_id>')
+@cache.cached_page('artist:{artist_id}')
 def show_artist(artist_id):
-    artist = Artist.query.get(artist_id) or abort(404)
-
-    # Join query for artist shows, extract artist and show details
-    """
-    --- Join query ---
-    # SELECT * FROM show LEFT OUTER JOIN artist ON artist.id = show.artist_id;
-    """
-    shows = Show.query.join(Artist).filter(Show.artist_id == artist.id)
-
-    past_shows = shows.filter(Show.start_time <= datetime.now())
-    upcoming_shows = shows.filter(Show.start_time > datetime.now())
-
-    context = {
-        **artist.__dict__,
-        'past_shows': past_shows.all(),
-        'upcoming_shows': upcoming_shows.all(),
-        'past_shows_count': past_shows.count(),
-        'upcoming_shows_count': upcoming_shows.count(),
-    }
+    context = queries.artist_detail(artist_id) or abort(404)
     return render_template('pages/show_artist.html', artist=context)
 
 
@@ -205,18 +176,54 @@ def edit_artist(artist_id):
         with db_session() as session:
             form.populate_obj(artist)
             session.add(artist)
+            cache.invalidate_artist(session, artist_id)
         return redirect(url_for('show_artist', artist_id=artist_id))
 
     return render_template('forms/change_artist.html', form=form, artist=artist)
 
 
-@app.route('/artists/search', methods=['POST'])
+@app.route('/artists/<artist_id>', methods=['DELETE'])
+def delete_artist(artist_id):
+    artist = Artist.query.get(artist_id) or abort(404)
+
+    try:
+        job_id = deletion.delete_entity('artist', artist.id)
+    except Exception:
+        abort(404)
+
+    return deleted('Artist', job_id)
+
+
+@app.route('/artists/search', methods=['GET', 'POST'])
 def search_artists():
-    search_term = request.form.get('search_term', '')
-    artists = Artist.query.filter(Artist.name.ilike(f'%{search_term}%'))
+    search_term = request.values.get('search_term', '')
+    page = request.values.get('page', 1, type=int)
+    artists = search.search_names(Artist, search_term, page)
+
+    return render_template('pages/search_artists.html', artists=artists, search_term=search_term)
+
+
+@app.route('/artists/browse')
+def browse_artists():
+    return browse(facets.ARTISTS, 'Artists')
+
+
+#  Browse
+#  ----------------------------------------------------------------
 
-    return render_template('pages/search_artists.html', artists=artists,
-                           search_term=request.form.get('search_term', ''))
+def browse(faceted, title):
+    """Faceted listing: filtered entities (keyset paginated) plus per-facet counts, see fyyur.facets"""
+    genres, states, seeking = facets.parse_filters(request.args)
+    query = facets.filter_query(faceted, genres, states, seeking)
+    counts = facets.facet_counts(faceted, genres, states, seeking)
+
+    model = faceted.model
+    entities = keyset_page(query.with_entities(model.id, model.name), [model.name, model.id])
+
+    filters = {key: request.args.getlist(key) for key in ('genre', 'state', 'seeking') if key in request.args}
+    return render_template('pages/browse.html', title=title, faceted=faceted, entities=entities,
+                           facets=facets.facet_links(faceted, request.args, counts, genres, states, seeking),
+                           filters=filters)
 
 
 #  Shows
@@ -224,12 +231,27 @@ def search_artists():
 
 
 @app.route('/shows')
+@cache.cached_page('shows')
 def list_shows():
     # Only list upcoming shows
-    shows = Show.query.filter(Show.start_time > datetime.now())
+    shows = keyset_page(Show.query.filter(Show.start_time > datetime.now()), [Show.start_time, Show.id])
     return render_template('pages/shows.html', shows=shows)
 
 
+@app.route('/shows/calendar')
+def shows_calendar():
+    """Shows in a date range (default: this weekend), e.g. /shows/calendar?start=2021-03-27&end=2021-03-28&state=CA"""
+    try:
+        start, end, state = queries.calendar_filters(request.args, app.config['CALENDAR_MAX_DAYS'])
+    except ValueError:
+        abort(400)
+    shows = keyset_page(queries.shows_between(start, end, state), [Show.start_time, Show.id])
+    filters = {'start': start.isoformat(), 'end': end.isoformat()}
+    if state is not None:
+        filters['state'] = state.name
+    return render_template('pages/shows.html', shows=shows, endpoint='shows_calendar', filters=filters)
+
+
 @app.route('/shows/create', methods=['GET', 'POST'])
 def create_show():
     form = ShowForm(request.form)
@@ -243,6 +265,9 @@ def create_show():
                     show = Show()
                     form.populate_obj(show)
                     session.add(show)
+                    summaries.record_show(show)
+                    cache.invalidate_on_commit(session, 'venues', 'shows', f'venue:{show.venue_id}',
+                                               f'artist:{show.artist_id}')
             except Exception:
                 success_msg = ['Failed to add Show!', 'alert-danger']
         else:
@@ -255,6 +280,17 @@ def create_show():
     return render_template('forms/change_show.html', form=form, add=True)
 
 
+#  Metrics
+#  ----------------------------------------------------------------
+
+@app.route('/metrics/db')
+def db_metrics():
+    """Connection pool metrics of the primary and of each bind (e.g. the read replicas), by bind key"""
+    pools = {bind or 'primary': db.get_engine(app, bind=bind).pool
+             for bind in [None, *(app.config['SQLALCHEMY_BINDS'] or {})]}
+    return jsonify({key: pool.metrics.as_dict(pool) for key, pool in pools.items()})
+
+
 #  Default Handlers
 #  ----------------------------------------------------------------
 
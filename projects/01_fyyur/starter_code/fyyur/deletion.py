@@ -0,0 +1,134 @@
+"""
+Deletion of venues and artists.
+
+Shows are deleted by the database (ON DELETE CASCADE on show.venue_id / show.artist_id, see migration 9e3b7c1a5f42),
+so deleting an entity is a single statement that never loads its shows. Entities with more than DELETE_ASYNC_THRESHOLD
+shows are handed to a background job instead, so the request returns immediately: the job deletes the shows in batches
+of DELETE_BATCH_SIZE (one short transaction each, progress is recorded on the job) and then the entity itself.
+Job status is served at /delete-jobs/<id>, jobs interrupted by a restart can be finished with `flask run-delete-jobs`.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import click
+from flask import jsonify, abort
+
+from fyyur import app
+from . import cache, summaries
+from .queries import partner_ids
+from .models import db, db_session, Show, DeleteJob
+
+# kind: (summary, other party's summary, delete function, cache invalidation)
+KINDS = {
+    'venue': (summaries.VENUE, summaries.ARTIST, summaries.remove_venue, cache.invalidate_venue),
+    'artist': (summaries.ARTIST, summaries.VENUE, summaries.remove_artist, cache.invalidate_artist),
+}
+
+executor = ThreadPoolExecutor(max_workers=app.config['DELETE_JOB_WORKERS'], thread_name_prefix='delete-job')
+
+
+def show_count(summary, entity_id):
+    """Number of shows of an entity, read from its show summary"""
+    model, key, _, _ = summary
+    return db.session.query(model.upcoming_shows + model.past_shows).filter(key == entity_id).scalar() or 0
+
+
+def delete_entity(kind, entity_id):
+    """
+    Delete a venue or artist. Entities with few shows are deleted right away and None is returned, otherwise the id of
+    the background job deleting the entity is returned.
+    """
+    summary, _, remove, invalidate = KINDS[kind]
+    shows = show_count(summary, entity_id)
+
+    if shows <= app.config['DELETE_ASYNC_THRESHOLD']:
+        with db_session() as session:
+            invalidate(session, entity_id)
+            remove(session, entity_id)
+        return None
+
+    with db_session() as session:
+        job = DeleteJob.query.filter(DeleteJob.kind == kind, DeleteJob.entity_id == entity_id,
+                                     DeleteJob.status.in_(['pending', 'running'])).first()
+        if job is not None:
+            return job.id  # Already being deleted
+        job = DeleteJob(kind=kind, entity_id=entity_id, shows_total=shows)
+        session.add(job)
+        session.flush()
+        job_id = job.id
+    db.session.commit()  # The job runs in its own session, it has to see the job row
+    executor.submit(run_job, job_id)
+    return job_id
+
+
+def run_job(job_id):
+    """Delete the shows of a job's entity in batches, then the entity itself"""
+    with app.app_context():
+        try:
+            job = DeleteJob.query.get(job_id)
+            summary, other, remove, invalidate = KINDS[job.kind]
+            _, _, show_fk, _ = summary
+            _, _, other_fk, _ = other
+            # The other party of every show is recounted once all shows are gone
+            other_ids = partner_ids(show_fk, other_fk, job.entity_id)
+            job.status = 'running'
+            db.session.commit()
+
+            batch_size = app.config['DELETE_BATCH_SIZE']
+            while True:
+                invalidate(db.session, job.entity_id)
+                batch = db.session.query(Show.id).filter(show_fk == job.entity_id).limit(batch_size).subquery()
+                deleted = Show.query.filter(Show.id.in_(batch)).delete(synchronize_session=False)
+                job.shows_deleted += deleted
+                db.session.commit()
+                if deleted < batch_size:
+                    break
+
+            invalidate(db.session, job.entity_id)
+            remove(db.session, job.entity_id)
+            summaries.refresh(other, other_ids)
+            job.status = 'done'
+            job.finished_at = datetime.now()
+            db.session.commit()
+        except Exception as exc:
+            app.logger.exception('Delete job %s failed', job_id)
+            db.session.rollback()
+            job = DeleteJob.query.get(job_id)
+            if job is not None:
+                job.status = 'failed'
+                job.error = str(exc)[:500]
+                job.finished_at = datetime.now()
+                db.session.commit()
+        finally:
+            db.session.remove()
+
+
+@app.route('/delete-jobs/<int:job_id>')
+def delete_job_status(job_id):
+    job = DeleteJob.query.get(job_id) or abort(404)
+    return jsonify({
+        'id': job.id,
+        'kind': job.kind,
+        'entity_id': job.entity_id,
+        'status': job.status,
+        'shows_total': job.shows_total,
+        'shows_deleted': job.shows_deleted,
+        'error': job.error,
+        'created_at': job.created_at.isoformat(),
+        'finished_at': job.finished_at.isoformat() if job.finished_at else None,
+    })
+
+
+# ----------------------------------------------------------------------------#
+# Commands.
+# ----------------------------------------------------------------------------#
+
+@app.cli.command('run-delete-jobs')
+def run_delete_jobs():
+    """Finish delete jobs that were pending or interrupted (e.g. by a restart)."""
+    with app.app_context():
+        job_ids = [job_id for job_id, in db.session.query(DeleteJob.id)
+                   .filter(DeleteJob.status.in_(['pending', 'running'])).order_by(DeleteJob.id)]
+    for job_id in job_ids:
+        run_job(job_id)
+    click.echo(f'Ran {len(job_ids)} delete jobs')
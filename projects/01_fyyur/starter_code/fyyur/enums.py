@@ -2,18 +2,43 @@ from enum import IntEnum
 from us import states
 
 
+def cache_labels(cls):
+    """Compute the labels and choices of a ChoiceEnum once at import, so lookups are constant time"""
+    for member in cls:
+        member._label = member._compute_label()
+    cls._choices = tuple((member.value, member._label) for member in cls)
+    cls._labels_by_value = {member.value: member._label for member in cls}
+    cls._members_by_abbr = {member.name.upper(): member for member in cls}
+    return cls
+
+
 class ChoiceEnum(IntEnum):
     __labels__ = {}
 
+    def _compute_label(self):
+        return self.__labels__.get(self.value, self.name.replace('_', ' ').title())
+
     @property
     def label(self):
-        return self.__labels__.get(self.value, self.name.replace('_', ' ').title())
+        return self._label
 
     @classmethod
     def choices(cls):
-        return [(choice.value, choice.label) for choice in cls]
+        """(value, label) pairs of the members, shared and immutable: copy to a list before modifying"""
+        return cls._choices
 
+    @classmethod
+    def label_for(cls, value):
+        """Label for a raw value, e.g. State.label_for(5) == 'California'"""
+        return cls._labels_by_value[int(value)]
 
+    @classmethod
+    def from_abbr(cls, abbr):
+        """Member for a (case insensitive) name abbreviation, e.g. State.from_abbr('ca') is State.CA"""
+        return cls._members_by_abbr[abbr.upper()]
+
+
+@cache_labels
 class State(ChoiceEnum):
     AL = 1
     AK = 2
@@ -67,11 +92,11 @@ class State(ChoiceEnum):
     WI = 50
     WY = 51
 
-    @property
-    def label(self):
+    def _compute_label(self):
         return str(states.lookup(self.name))
 
 
+@cache_labels
 class Genre(ChoiceEnum):
     ALTERNATIVE = 1
     BLUES = 2
@@ -0,0 +1,117 @@
+"""
+Faceted browsing of venues and artists by genre, state and seeking status.
+
+Genre filters use array containment (`genres @> ARRAY[...]`), served by the GIN indexes on the genres columns (see
+migration 7d3e5f9a2b60). Per-facet counts are computed in a single UNION ALL statement.
+
+Genres are combined with AND, so genre counts are taken over the filtered set. States (OR) and seeking status (one
+value) are disjunctive: their counts apply every filter except their own, so the other states and seeking values stay
+listed, each with the number of entities selecting it would add (states) or switch to (seeking).
+"""
+from flask import url_for
+from werkzeug.datastructures import MultiDict
+from sqlalchemy import literal, union_all
+
+from . import enums
+from .models import db, Venue, Artist
+
+
+class Faceted(object):
+    def __init__(self, model, seeking, endpoint):
+        self.model = model
+        self.seeking = seeking  # Seeking status column
+        self.endpoint = endpoint
+
+
+VENUES = Faceted(Venue, Venue.seeking_talent, 'browse_venues')
+ARTISTS = Faceted(Artist, Artist.seeking_venue, 'browse_artists')
+
+
+def parse_filters(args):
+    """Read genre/state/seeking filters from request args, dropping unknown values"""
+    genres = [enums.Genre(v) for v in args.getlist('genre', type=int) if v in enums.Genre._value2member_map_]
+    states = [enums.State(v) for v in args.getlist('state', type=int) if v in enums.State._value2member_map_]
+    seeking = {'1': True, '0': False}.get(args.get('seeking'))
+    return genres, states, seeking
+
+
+def filter_query(faceted, genres, states, seeking):
+    query = faceted.model.query
+    if genres:
+        query = query.filter(faceted.model.genres.contains(genres))
+    if states:
+        query = query.filter(faceted.model.state.in_(states))
+    if seeking is not None:
+        query = query.filter(faceted.seeking == seeking)
+    return query
+
+
+def facet_counts(faceted, genres, states, seeking):
+    """
+    Count the entities per genre, state and seeking status in one round trip. Genre counts apply every filter, state
+    and seeking counts every filter but their own (disjunctive facets).
+
+    --- Facet query ---
+    # SELECT 'genre', genre, count(*) FROM (SELECT unnest(genres) AS genre FROM venue WHERE <all filters>) GROUP BY genre
+    # UNION ALL SELECT 'state', state, count(*) FROM venue WHERE <genre and seeking filters> GROUP BY state
+    # UNION ALL SELECT 'seeking', seeking_talent::int, count(*) FROM venue WHERE <genre and state filters>
+    #   GROUP BY seeking_talent;
+    """
+    model = faceted.model
+    genre_matches = filter_query(faceted, genres, states, seeking).with_entities(model.genres).subquery()
+    genre_values = db.select([db.func.unnest(genre_matches.c.genres).label('genre')]).alias('genre_values')
+    state_matches = filter_query(faceted, genres, [], seeking).with_entities(model.state).subquery()
+    seeking_matches = filter_query(faceted, genres, states, None) \
+        .with_entities(faceted.seeking.label('seeking')).subquery()
+
+    facets = union_all(
+        db.select([literal('genre'), db.cast(genre_values.c.genre, db.Integer), db.func.count()])
+            .group_by(genre_values.c.genre),
+        db.select([literal('state'), db.cast(state_matches.c.state, db.Integer), db.func.count()])
+            .group_by(state_matches.c.state),
+        db.select([literal('seeking'), db.cast(seeking_matches.c.seeking, db.Integer), db.func.count()])
+            .group_by(seeking_matches.c.seeking),
+    )
+
+    counts = {'genre': {}, 'state': {}, 'seeking': {}}
+    for facet, value, count in db.session.execute(facets):
+        counts[facet][value] = count
+    return counts
+
+
+def _toggle_url(faceted, args, key, value):
+    """URL for the current filters with `key=value` toggled (single valued keys are replaced)"""
+    args = MultiDict(args)
+    args.pop('after', None)
+    args.pop('before', None)
+    values = args.getlist(key)
+    if str(value) in values:
+        values.remove(str(value))
+    elif key == 'seeking':
+        values = [str(value)]
+    else:
+        values.append(str(value))
+    args.setlist(key, values)
+    return url_for(faceted.endpoint, **args.to_dict(flat=False))
+
+
+def facet_links(faceted, args, counts, genres, states, seeking):
+    """Facet values with their counts, selection state and drill-down/undo links, for rendering"""
+    def entries(key, members, selected):
+        return [{
+            'label': member.label,
+            'count': counts[key].get(member.value, 0),
+            'selected': member in selected,
+            'url': _toggle_url(faceted, args, key, member.value),
+        } for member in members if member in selected or counts[key].get(member.value)]
+
+    return {
+        'Genres': entries('genre', enums.Genre, genres),
+        'States': entries('state', enums.State, states),
+        'Seeking': [{
+            'label': label,
+            'count': counts['seeking'].get(value, 0),
+            'selected': seeking == bool(value),
+            'url': _toggle_url(faceted, args, 'seeking', value),
+        } for value, label in ((1, 'Seeking'), (0, 'Not seeking')) if seeking == bool(value) or counts['seeking'].get(value)],
+    }
@@ -0,0 +1,74 @@
+"""
+Datetime formatting for templates.
+
+Babel patterns and locales are parsed once per (format, locale) and datetimes are formatted directly, strings are
+only parsed with dateutil as a fallback. Single values are memoized, and `format_datetimes` formats a whole column of
+timestamps at once, formatting each distinct timestamp only once.
+"""
+from datetime import timezone
+from functools import lru_cache
+
+import dateutil.parser
+from babel import Locale
+from babel.dates import LC_TIME, get_date_format, get_datetime_format, get_time_format, parse_pattern
+
+# Named fyyur formats, then Babel's named formats, anything else is used as a Babel pattern
+FORMATS = {
+    'full': "EEEE MMMM, d, y 'at' h:mma",
+    'medium': "EE MM, dd, y h:mma",
+}
+BABEL_FORMATS = ('full', 'long', 'medium', 'short')
+
+
+class LocaleFormat(object):
+    """A Babel named format of a locale: its date and time patterns joined as the locale's datetime format says"""
+
+    def __init__(self, format, locale):
+        self.combined = get_datetime_format(format, locale).replace("'", "")
+        self.date = get_date_format(format, locale)
+        self.time = get_time_format(format, locale)
+
+    def apply(self, value, locale):
+        return self.combined.replace('{0}', self.time.apply(value, locale)) \
+            .replace('{1}', self.date.apply(value, locale))
+
+
+@lru_cache(maxsize=None)
+def compile_format(format='medium', locale=None):
+    """Compiled Babel pattern and parsed locale for a (format, locale) pair"""
+    locale = Locale.parse(locale or LC_TIME)
+    if format in FORMATS:
+        return parse_pattern(FORMATS[format]), locale
+    if format in BABEL_FORMATS:
+        return LocaleFormat(format, locale), locale
+    return parse_pattern(format), locale
+
+
+def _to_datetime(value):
+    # Allow datetime objects as well as strings
+    if isinstance(value, str):
+        value = dateutil.parser.parse(value)
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)  # Babel treats naive datetimes as UTC
+    return value
+
+
+@lru_cache(maxsize=4096)
+def _format(value, format, locale):
+    pattern, locale = compile_format(format, locale)
+    return pattern.apply(_to_datetime(value), locale)
+
+
+def format_datetime(value, format='medium', locale=None):
+    return _format(value, format, locale)
+
+
+def format_datetimes(values, format='medium', locale=None):
+    """Batch mode: format a column of timestamps with one compiled pattern"""
+    values = list(values)
+    pattern, locale = compile_format(format, locale)
+    formatted = {}
+    for value in values:
+        if value not in formatted:
+            formatted[value] = pattern.apply(_to_datetime(value), locale)
+    return [formatted[value] for value in values]
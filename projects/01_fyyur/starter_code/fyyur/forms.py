@@ -1,6 +1,7 @@
 from datetime import datetime
 
 from flask_wtf import Form
+from sqlalchemy.orm.util import identity_key
 from wtforms import StringField, SelectField, SelectMultipleField, DateTimeField, BooleanField, IntegerField
 from wtforms.validators import DataRequired, URL, Optional, ValidationError
 
@@ -9,17 +10,50 @@ from . import models
 from .validators import GeoValidateUsPhone
 
 
+def _int_or_none(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def prefetch_show_references(rows):
+    """
+    Batch validation mode for ShowForm: collect the artist and venue IDs referenced by `rows` (dicts/formdata) that
+    exist, with one IN query per model. IDs already present in the session identity map are not queried again.
+    Pass the result to ShowForm as `existing_ids`.
+    """
+    existing_ids = {}
+    for model, key in ((models.Artist, 'artist_id'), (models.Venue, 'venue_id')):
+        ids = {_int_or_none(row.get(key)) for row in rows} - {None}
+        known = {i for i in ids if models.db.session.identity_map.get(identity_key(model, i)) is not None}
+        missing = ids - known
+        if missing:
+            known.update(i for i, in models.db.session.query(model.id).filter(model.id.in_(missing)))
+        existing_ids[model] = known
+    return existing_ids
+
+
 class ShowForm(Form):
     artist_id = IntegerField('artist_id')
     venue_id = IntegerField('venue_id')
     start_time = DateTimeField('start_time', validators=[DataRequired()], default=datetime.today())
 
+    def __init__(self, *args, existing_ids=None, **kwargs):
+        super(ShowForm, self).__init__(*args, **kwargs)
+        self.existing_ids = existing_ids  # See prefetch_show_references
+
+    def _exists(self, model, entity_id):
+        if self.existing_ids is not None:
+            return entity_id in self.existing_ids[model]
+        return model.query.get(entity_id) is not None
+
     def validate_artist_id(self, field):
-        if models.Artist.query.get(field.data) is None:
+        if not self._exists(models.Artist, field.data):
             raise ValidationError('Artist matching ID not found')
 
     def validate_venue_id(self, field):
-        if models.Venue.query.get(field.data) is None:
+        if not self._exists(models.Venue, field.data):
             raise ValidationError('Venue matching ID not found')
 
 
@@ -28,14 +62,14 @@ class VenueForm(Form):
     city = StringField('city', validators=[DataRequired()])
     state = SelectField(
         'state', validators=[DataRequired()],
-        choices=enums.State.choices()
+        choices=list(enums.State.choices())
     )
     address = StringField('address', validators=[DataRequired()])
     phone = StringField('phone', validators=[DataRequired(), GeoValidateUsPhone()])
 
     genres = SelectMultipleField(
         'genres', validators=[DataRequired()],
-        choices=enums.Genre.choices(), coerce=int,
+        choices=list(enums.Genre.choices()), coerce=int,
     )
     seeking_talent = BooleanField('seeking_talent', default=True)
     seeking_description = StringField('seeking_description', validators=[Optional()])
@@ -50,13 +84,13 @@ class ArtistForm(Form):
     city = StringField('city', validators=[DataRequired()])
     state = SelectField(
         'state', validators=[DataRequired()],
-        choices=enums.State.choices()
+        choices=list(enums.State.choices())
     )
     phone = StringField('phone', validators=[DataRequired(), GeoValidateUsPhone()])
 
     genres = SelectMultipleField(
         'genres', validators=[DataRequired()],
-        choices=enums.Genre.choices(), coerce=int,
+        choices=list(enums.Genre.choices()), coerce=int,
     )
     seeking_venue = BooleanField('seeking_venue', default=True)
     seeking_description = StringField('seeking_description', validators=[Optional()])
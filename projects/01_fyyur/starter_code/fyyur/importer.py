@@ -0,0 +1,176 @@
+"""
+Bulk import of venues, artists and shows from CSV, JSON or JSON lines files.
+
+    flask import-data venues venues.csv
+
+Every row is validated with the same form as the create pages (including the phone/state check), valid rows are
+inserted in chunks with executemany, and invalid rows are reported without aborting the load. A chunk the database
+rejects (e.g. a value too long for its column) is inserted again row by row, so only the failing rows are reported.
+List values (genres) are separated by ';' in CSV files, states and genres may be given by value or by name.
+"""
+import csv
+import json
+import os
+from itertools import islice
+
+import click
+from sqlalchemy.exc import SQLAlchemyError
+from werkzeug.datastructures import MultiDict
+
+from fyyur import app
+from . import enums, summaries
+from .cache import invalidate_on_commit
+from .forms import VenueForm, ArtistForm, ShowForm, prefetch_show_references
+from .models import db, Venue, Artist, Show
+
+IMPORTERS = {
+    'venues': (VenueForm, Venue),
+    'artists': (ArtistForm, Artist),
+    'shows': (ShowForm, Show),
+}
+
+FALSE_VALUES = ('', '0', 'false', 'no', 'n', 'f')
+
+
+def read_rows(path):
+    """Stream rows (dicts) from a .csv, .json (array) or .jsonl file"""
+    ext = os.path.splitext(path)[1].lower()
+    with open(path, newline='') as f:
+        if ext == '.csv':
+            for row in csv.DictReader(f):
+                if row.get('genres') is not None:
+                    row['genres'] = [genre for genre in row['genres'].split(';') if genre.strip()]
+                yield row
+        elif ext == '.jsonl':
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+        elif ext == '.json':
+            yield from json.load(f)
+        else:
+            raise click.BadParameter(f'Unsupported file type {ext!r}, expected .csv, .json or .jsonl')
+
+
+def _enum_value(enum, value):
+    """Accept enum values or (case insensitive) names/abbreviations"""
+    value = str(value).strip()
+    return value if value.isdigit() else str(enum.from_abbr(value.replace(' ', '_')).value)
+
+
+def to_formdata(row):
+    formdata = MultiDict()
+    for key, value in row.items():
+        if value is None:
+            continue
+        if key == 'state':
+            value = _enum_value(enums.State, value)
+        if key == 'genres':
+            formdata.setlist(key, [_enum_value(enums.Genre, genre) for genre in value])
+            continue
+        if key.startswith('seeking_') and key != 'seeking_description':
+            if str(value).strip().lower() in FALSE_VALUES:
+                continue  # Absent checkbox is False
+            value = 'y'
+        formdata[key] = str(value)
+    return formdata
+
+
+def validate_row(form_class, model, row, **form_kwargs):
+    """Validate a row with the model's form, returns (column values, errors)"""
+    try:
+        formdata = to_formdata(row)
+    except KeyError as exc:
+        return None, {'row': [f'Unknown value {exc}']}
+
+    form = form_class(formdata, meta={'csrf': False}, **form_kwargs)
+    if not form.validate():
+        return None, form.errors
+
+    columns = model.__table__.columns.keys()
+    return {key: value for key, value in form.data.items() if key in columns and key != 'id'}, None
+
+
+def insert_each(model, rows, on_error=None):
+    """
+    Insert (row number, values) `rows` one at a time, each in its own savepoint. Returns the values inserted, rows the
+    database rejects are passed to `on_error(row_number, errors)`.
+    """
+    inserted = []
+    for number, values in rows:
+        try:
+            with db.session.begin_nested():
+                db.session.execute(model.__table__.insert(), values)
+        except SQLAlchemyError as exc:
+            if on_error:
+                on_error(number, {'row': [str(getattr(exc, 'orig', exc)).strip()]})
+            continue
+        inserted.append(values)
+    return inserted
+
+
+def import_rows(kind, rows, chunk_size=None, on_error=None):
+    """
+    Validate and insert `rows` of the given kind, one chunk of `chunk_size` rows at a time (one commit per chunk).
+    Returns the number of rows imported, invalid rows and rows rejected by the database are passed to
+    `on_error(row_number, errors)`.
+    """
+    form_class, model = IMPORTERS[kind]
+    chunk_size = chunk_size or app.config['IMPORT_CHUNK_SIZE']
+    imported = 0
+    rows = enumerate(rows, start=1)
+
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            break
+
+        form_kwargs = {}
+        if model is Show:
+            # Check artist/venue existence for the whole chunk with one query each
+            form_kwargs['existing_ids'] = prefetch_show_references([row for _, row in chunk])
+
+        valid = []
+        for number, row in chunk:
+            row_values, errors = validate_row(form_class, model, row, **form_kwargs)
+            if errors:
+                if on_error:
+                    on_error(number, errors)
+                continue
+            valid.append((number, row_values))
+
+        values = [row_values for _, row_values in valid]
+        try:
+            if values:
+                db.session.execute(model.__table__.insert(), values)
+        except SQLAlchemyError:
+            # Find the rows the database rejects
+            db.session.rollback()
+            values = insert_each(model, valid, on_error)
+
+        if values:
+            invalidate_on_commit(db.session, kind)
+            if model is Show:
+                summaries.refresh(summaries.VENUE, [show['venue_id'] for show in values])
+                summaries.refresh(summaries.ARTIST, [show['artist_id'] for show in values])
+                invalidate_on_commit(db.session, 'venues', *{f'venue:{show["venue_id"]}' for show in values},
+                                     *{f'artist:{show["artist_id"]}' for show in values})
+            db.session.commit()
+            imported += len(values)
+    return imported
+
+
+@app.cli.command('import-data')
+@click.argument('kind', type=click.Choice(list(IMPORTERS)))
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--chunk-size', type=int, default=None, help='Rows inserted per executemany/commit.')
+def import_data(kind, path, chunk_size):
+    """Bulk import venues, artists or shows from a CSV/JSON/JSON lines file."""
+    failed = []
+
+    def report(number, errors):
+        failed.append(number)
+        click.echo(f'Row {number}: {json.dumps(errors)}', err=True)
+
+    with app.test_request_context():
+        imported = import_rows(kind, read_rows(path), chunk_size, on_error=report)
+    click.echo(f'Imported {imported} {kind}, {len(failed)} rows failed')
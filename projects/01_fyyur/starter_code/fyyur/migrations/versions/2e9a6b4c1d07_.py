@@ -0,0 +1,25 @@
+"""keyset pagination indexes
+
+Revision ID: 2e9a6b4c1d07
+Revises: 8c41d2a7f3b9
+Create Date: 2021-03-22 09:41:12.583019
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '2e9a6b4c1d07'
+down_revision = '8c41d2a7f3b9'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_artist_name_id', 'artist', ['name', 'id'], unique=False)
+    op.create_index('ix_show_start_time_id', 'show', ['start_time', 'id'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_show_start_time_id', table_name='show')
+    op.drop_index('ix_artist_name_id', table_name='artist')
@@ -0,0 +1,26 @@
+"""show calendar indexes
+
+Revision ID: 4a6c8e0b2d15
+Revises: 7d3e5f9a2b60
+Create Date: 2021-03-29 11:52:40.390215
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '4a6c8e0b2d15'
+down_revision = '7d3e5f9a2b60'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Plain start_time range scans are served by ix_show_start_time_id (start_time, id)
+    op.create_index('ix_show_venue_id_start_time', 'show', ['venue_id', 'start_time'], unique=False)
+    op.create_index('ix_show_artist_id_start_time', 'show', ['artist_id', 'start_time'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_show_artist_id_start_time', table_name='show')
+    op.drop_index('ix_show_venue_id_start_time', table_name='show')
@@ -0,0 +1,57 @@
+"""show summary counters
+
+Revision ID: 5b2f0c7d9e14
+Revises: 3831862da4a5
+Create Date: 2021-03-18 10:12:45.204511
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '5b2f0c7d9e14'
+down_revision = '3831862da4a5'
+branch_labels = None
+depends_on = None
+
+BACKFILL = """
+INSERT INTO {table} ({key}, upcoming_shows, past_shows, next_show_time)
+SELECT {entity}.id,
+       count(show.id) FILTER (WHERE show.start_time > now()),
+       count(show.id) FILTER (WHERE show.start_time <= now()),
+       min(show.start_time) FILTER (WHERE show.start_time > now())
+FROM {entity} LEFT OUTER JOIN show ON show.{key} = {entity}.id
+GROUP BY {entity}.id
+"""
+
+
+def upgrade():
+    op.create_table('venue_show_summary',
+    sa.Column('venue_id', sa.Integer(), nullable=False),
+    sa.Column('upcoming_shows', sa.Integer(), nullable=False),
+    sa.Column('past_shows', sa.Integer(), nullable=False),
+    sa.Column('next_show_time', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['venue_id'], ['venue.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('venue_id')
+    )
+    op.create_index(op.f('ix_venue_show_summary_next_show_time'), 'venue_show_summary', ['next_show_time'], unique=False)
+    op.create_table('artist_show_summary',
+    sa.Column('artist_id', sa.Integer(), nullable=False),
+    sa.Column('upcoming_shows', sa.Integer(), nullable=False),
+    sa.Column('past_shows', sa.Integer(), nullable=False),
+    sa.Column('next_show_time', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['artist_id'], ['artist.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('artist_id')
+    )
+    op.create_index(op.f('ix_artist_show_summary_next_show_time'), 'artist_show_summary', ['next_show_time'], unique=False)
+
+    # Populate counters for existing shows
+    op.execute(BACKFILL.format(table='venue_show_summary', key='venue_id', entity='venue'))
+    op.execute(BACKFILL.format(table='artist_show_summary', key='artist_id', entity='artist'))
+
+
+def downgrade():
+    op.drop_index(op.f('ix_artist_show_summary_next_show_time'), table_name='artist_show_summary')
+    op.drop_table('artist_show_summary')
+    op.drop_index(op.f('ix_venue_show_summary_next_show_time'), table_name='venue_show_summary')
+    op.drop_table('venue_show_summary')
@@ -0,0 +1,25 @@
+"""genre GIN indexes
+
+Revision ID: 7d3e5f9a2b60
+Revises: 2e9a6b4c1d07
+Create Date: 2021-03-24 14:27:03.118946
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '7d3e5f9a2b60'
+down_revision = '2e9a6b4c1d07'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_venue_genres', 'venue', ['genres'], unique=False, postgresql_using='gin')
+    op.create_index('ix_artist_genres', 'artist', ['genres'], unique=False, postgresql_using='gin')
+
+
+def downgrade():
+    op.drop_index('ix_artist_genres', table_name='artist')
+    op.drop_index('ix_venue_genres', table_name='venue')
@@ -0,0 +1,45 @@
+"""show delete cascade and delete jobs
+
+Revision ID: 9e3b7c1a5f42
+Revises: 4a6c8e0b2d15
+Create Date: 2021-04-02 15:21:08.613542
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '9e3b7c1a5f42'
+down_revision = '4a6c8e0b2d15'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Let the database delete the shows of a deleted venue/artist
+    op.drop_constraint('show_venue_id_fkey', 'show', type_='foreignkey')
+    op.drop_constraint('show_artist_id_fkey', 'show', type_='foreignkey')
+    op.create_foreign_key('show_venue_id_fkey', 'show', 'venue', ['venue_id'], ['id'], ondelete='CASCADE')
+    op.create_foreign_key('show_artist_id_fkey', 'show', 'artist', ['artist_id'], ['id'], ondelete='CASCADE')
+
+    op.create_table('delete_job',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('kind', sa.String(length=20), nullable=False),
+    sa.Column('entity_id', sa.Integer(), nullable=False),
+    sa.Column('status', sa.String(length=20), nullable=False),
+    sa.Column('shows_total', sa.Integer(), nullable=False),
+    sa.Column('shows_deleted', sa.Integer(), nullable=False),
+    sa.Column('error', sa.String(length=500), nullable=True),
+    sa.Column('created_at', sa.DateTime(), server_default=sa.text('now()'), nullable=False),
+    sa.Column('finished_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+
+
+def downgrade():
+    op.drop_table('delete_job')
+
+    op.drop_constraint('show_artist_id_fkey', 'show', type_='foreignkey')
+    op.drop_constraint('show_venue_id_fkey', 'show', type_='foreignkey')
+    op.create_foreign_key('show_artist_id_fkey', 'show', 'artist', ['artist_id'], ['id'])
+    op.create_foreign_key('show_venue_id_fkey', 'show', 'venue', ['venue_id'], ['id'])
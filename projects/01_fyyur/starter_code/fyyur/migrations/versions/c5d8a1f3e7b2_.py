@@ -0,0 +1,30 @@
+"""server-side session store
+
+Revision ID: c5d8a1f3e7b2
+Revises: 9e3b7c1a5f42
+Create Date: 2021-04-06 09:47:12.385120
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'c5d8a1f3e7b2'
+down_revision = '9e3b7c1a5f42'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('session_store',
+    sa.Column('id', sa.String(length=64), nullable=False),
+    sa.Column('data', sa.Text(), nullable=False),
+    sa.Column('expires_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_session_store_expires_at'), 'session_store', ['expires_at'], unique=False)
+
+
+def downgrade():
+    op.drop_index(op.f('ix_session_store_expires_at'), table_name='session_store')
+    op.drop_table('session_store')
@@ -2,27 +2,39 @@ import os
 from contextlib import contextmanager
 
 from flask_migrate import Migrate
-from flask_sqlalchemy import SQLAlchemy
+from replica_routing import RoutingSQLAlchemy
 from sqlalchemy.dialects.postgresql import ARRAY
 
 from fyyur import app
 from . import enums
+from .pool import TimedQueuePool
 
-db = SQLAlchemy(app)
+db = RoutingSQLAlchemy(app, engine_options={'poolclass': TimedQueuePool})
 
 
 @contextmanager
 def db_session():
-    """Provide a transactional scope around a series of operations."""
+    """
+    Provide a scope around a series of operations, flushed at the end and rolled back if any of them fails.
+    The request is the unit of work: its changes are committed once, by `commit_unit_of_work`, after the response is
+    built. Code outside a request (jobs, commands) commits itself.
+    """
     session = db.session
+    session.info['primary'] = True  # Read and write on the primary from here on
     try:
         yield session
-        session.commit()
+        session.flush()
     except:
         session.rollback()
         raise
-    finally:
-        session.close()
+
+
+@app.after_request
+def commit_unit_of_work(response):
+    # Failed requests are rolled back when Flask-SQLAlchemy removes the session at teardown
+    if response.status_code < 400:
+        db.session.commit()
+    return response
 
 
 # Instantiate Migrate
@@ -36,6 +48,7 @@ class IntEnum(db.TypeDecorator):
     def __init__(self, enumtype, *args, **kwargs):
         super(IntEnum, self).__init__(*args, **kwargs)
         self._enumtype = enumtype
+        self._members = enumtype._value2member_map_  # Cached value -> member table
 
     def process_bind_param(self, value, dialect):
         if isinstance(value, str):
@@ -45,18 +58,50 @@ class IntEnum(db.TypeDecorator):
         return value.value
 
     def process_result_value(self, value, dialect):
-        return self._enumtype(value)
+        if value is None:
+            return None
+        return self._members[value]
+
+
+class IntEnumArray(db.TypeDecorator):
+    """
+    SMALLINT[] of enum members.
+    Whole arrays are encoded/decoded in one pass against the cached value table, rather than running every element
+    through the IntEnum TypeDecorator. The ARRAY comparators (e.g. `.overlap()`, `.contains()`) remain available.
+    """
+    impl = ARRAY(db.SmallInteger)
+
+    def __init__(self, enumtype, *args, **kwargs):
+        super(IntEnumArray, self).__init__(*args, **kwargs)
+        self._enumtype = enumtype
+        self._members = enumtype._value2member_map_
+
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        return [int(item) for item in value]  # int() covers enum members, ints and numeric strings
+
+    def bind_expression(self, bindvalue):
+        # psycopg2 sends python int lists as INTEGER[], which has no operators against SMALLINT[]
+        return db.cast(bindvalue, ARRAY(db.SmallInteger))
+
+    def process_result_value(self, value, dialect):
+        if value is None:
+            return None
+        members = self._members
+        return [members[item] for item in value]
 
 
 class Show(db.Model):
     __tablename__ = 'show'
     id = db.Column(db.Integer, primary_key=True)
-    venue_id = db.Column(db.Integer, db.ForeignKey('venue.id'), nullable=False)
-    artist_id = db.Column(db.Integer, db.ForeignKey('artist.id'), nullable=False)
+    # Shows are deleted with their venue/artist by the database, see fyyur.deletion
+    venue_id = db.Column(db.Integer, db.ForeignKey('venue.id', ondelete='CASCADE'), nullable=False)
+    artist_id = db.Column(db.Integer, db.ForeignKey('artist.id', ondelete='CASCADE'), nullable=False)
     start_time = db.Column(db.DateTime, nullable=False)
-    venue = db.relationship('Venue', backref=db.backref('shows_artist', cascade='all, delete'),
+    venue = db.relationship('Venue', backref=db.backref('shows_artist', cascade='all, delete', passive_deletes=True),
                             lazy='joined')
-    artist = db.relationship('Artist', backref=db.backref('shows_artist', cascade='all, delete'),
+    artist = db.relationship('Artist', backref=db.backref('shows_artist', cascade='all, delete', passive_deletes=True),
                              lazy='joined')
 
 
@@ -68,14 +113,14 @@ class Venue(db.Model):
     state = db.Column(IntEnum(enums.State), nullable=False)
     address = db.Column(db.String(120), nullable=False)
     phone = db.Column(db.String(120), nullable=False)
-    genres = db.Column(ARRAY(IntEnum(enums.Genre)))  # Note this must be cast in migrations file to SmallInteger()
+    genres = db.Column(IntEnumArray(enums.Genre))  # Note this must be cast in migrations file to SmallInteger()
     website = db.Column(db.String(120))
     image_link = db.Column(db.String(500))
     facebook_link = db.Column(db.String(120))
     seeking_talent = db.Column(db.Boolean, default=False, nullable=False)
     seeking_description = db.Column(db.String(500))
 
-    shows = db.relationship('Show')
+    shows = db.relationship('Show', passive_deletes=True)
     # shows = db.relationship('Show', back_populates='venue', cascade="all, delete")
 
 
@@ -86,12 +131,52 @@ class Artist(db.Model):
     city = db.Column(db.String(120), nullable=False)
     state = db.Column(IntEnum(enums.State), nullable=False)
     phone = db.Column(db.String(120), nullable=False)
-    genres = db.Column(ARRAY(IntEnum(enums.Genre)))  # Note this must be cast in migrations file to SmallInteger()
+    genres = db.Column(IntEnumArray(enums.Genre))  # Note this must be cast in migrations file to SmallInteger()
     website = db.Column(db.String(120))
     image_link = db.Column(db.String(500))
     facebook_link = db.Column(db.String(120))
     seeking_venue = db.Column(db.Boolean, default=False, nullable=False)
     seeking_description = db.Column(db.String(500))
 
-    shows = db.relationship('Show')
+    shows = db.relationship('Show', passive_deletes=True)
     # shows = db.relationship('Show', back_populates='artist', cascade="all, delete")
+
+
+class VenueShowSummary(db.Model):
+    """Denormalized show counters for a venue, maintained by fyyur.summaries"""
+    __tablename__ = 'venue_show_summary'
+    venue_id = db.Column(db.Integer, db.ForeignKey('venue.id', ondelete='CASCADE'), primary_key=True)
+    upcoming_shows = db.Column(db.Integer, default=0, nullable=False)
+    past_shows = db.Column(db.Integer, default=0, nullable=False)
+    next_show_time = db.Column(db.DateTime, index=True)  # Earliest upcoming show, the next roll-forward point
+
+
+class ArtistShowSummary(db.Model):
+    """Denormalized show counters for an artist, maintained by fyyur.summaries"""
+    __tablename__ = 'artist_show_summary'
+    artist_id = db.Column(db.Integer, db.ForeignKey('artist.id', ondelete='CASCADE'), primary_key=True)
+    upcoming_shows = db.Column(db.Integer, default=0, nullable=False)
+    past_shows = db.Column(db.Integer, default=0, nullable=False)
+    next_show_time = db.Column(db.DateTime, index=True)  # Earliest upcoming show, the next roll-forward point
+
+
+class DeleteJob(db.Model):
+    """Background deletion of a venue or artist with many shows, see fyyur.deletion"""
+    __tablename__ = 'delete_job'
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(20), nullable=False)  # 'venue' or 'artist'
+    entity_id = db.Column(db.Integer, nullable=False)
+    status = db.Column(db.String(20), default='pending', nullable=False)  # pending, running, done or failed
+    shows_total = db.Column(db.Integer, default=0, nullable=False)
+    shows_deleted = db.Column(db.Integer, default=0, nullable=False)
+    error = db.Column(db.String(500))
+    created_at = db.Column(db.DateTime, server_default=db.func.now(), nullable=False)
+    finished_at = db.Column(db.DateTime)
+
+
+class StoredSession(db.Model):
+    """Server-side session data, used by fyyur.sessions.SQLSessionStore"""
+    __tablename__ = 'session_store'
+    id = db.Column(db.String(64), primary_key=True)
+    data = db.Column(db.Text, nullable=False)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
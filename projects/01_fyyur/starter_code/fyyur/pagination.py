@@ -0,0 +1,83 @@
+"""
+Keyset (cursor) pagination for listing pages.
+
+Pages are seeked with a row comparison on the sort columns, e.g. `WHERE (name, id) > (:name, :id)`, so every page
+costs the same index range scan no matter how deep the user pages. Cursors are opaque, URL-safe encodings of the
+sort key of the first/last row on a page.
+"""
+import base64
+import json
+from datetime import datetime
+
+from sqlalchemy import tuple_
+
+from fyyur import app
+
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f'Cannot encode {type(value)} in a cursor')
+
+
+def encode_cursor(item, columns):
+    values = [getattr(item, column.key) for column in columns]
+    return base64.urlsafe_b64encode(json.dumps(values, default=_json_default).encode()).decode()
+
+
+def decode_cursor(cursor, columns):
+    """Decode a cursor into sort key values, raises ValueError if the cursor is malformed"""
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        if not isinstance(values, list) or len(values) != len(columns):
+            raise ValueError('Wrong number of cursor values')
+        values = [
+            datetime.fromisoformat(value) if column.type.python_type is datetime else value
+            for column, value in zip(columns, values)
+        ]
+        if not all(isinstance(value, column.type.python_type) for column, value in zip(columns, values)):
+            raise ValueError('Wrong cursor value types')
+    except (TypeError, ValueError):
+        raise ValueError('Malformed cursor')
+    return values
+
+
+class KeysetPage(object):
+    def __init__(self, items, next_cursor=None, prev_cursor=None):
+        self.items = items
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+
+    def __iter__(self):
+        return iter(self.items)
+
+
+def keyset_paginate(query, columns, after=None, before=None, per_page=None):
+    """
+    Return the page of `query` following the `after` cursor (or preceding the `before` cursor), ordered by `columns`.
+    The columns must uniquely order the rows, i.e. end with a primary key. Raises ValueError for malformed cursors.
+    """
+    per_page = per_page or app.config['LIST_RESULTS_PER_PAGE']
+    key = tuple_(*columns)
+
+    if before:
+        # Seek backwards and flip the page back into ascending order
+        values = decode_cursor(before, columns)
+        rows = query.filter(key < tuple_(*values)) \
+            .order_by(*[column.desc() for column in columns]) \
+            .limit(per_page + 1).all()
+        items = rows[:per_page][::-1]
+        has_next, has_prev = True, len(rows) > per_page
+    else:
+        if after:
+            values = decode_cursor(after, columns)
+            query = query.filter(key > tuple_(*values))
+        rows = query.order_by(*columns).limit(per_page + 1).all()
+        items = rows[:per_page]
+        has_next, has_prev = len(rows) > per_page, bool(after)
+
+    return KeysetPage(
+        items,
+        next_cursor=encode_cursor(items[-1], columns) if has_next and items else None,
+        prev_cursor=encode_cursor(items[0], columns) if has_prev and items else None,
+    )
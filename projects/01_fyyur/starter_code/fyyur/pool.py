@@ -0,0 +1,63 @@
+"""
+Database connection pool instrumentation.
+
+Every engine's QueuePool (the primary's and each replica bind's) is sized by the DB_POOL_* settings (see fyyur.config).
+TimedQueuePool records in its own `metrics` how long each checkout waited for a connection (free or newly opened) and
+how many checkouts timed out, served per bind at /metrics/db.
+"""
+import threading
+import time
+
+from sqlalchemy.exc import TimeoutError
+from sqlalchemy.pool import QueuePool
+
+
+class PoolMetrics(object):
+    def __init__(self):
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, wait, timed_out=False):
+        with self._lock:
+            self.checkouts += 1
+            self.timeouts += int(timed_out)
+            self.wait_seconds += wait
+            self.max_wait_seconds = max(self.max_wait_seconds, wait)
+
+    def as_dict(self, pool):
+        return {
+            'checkouts': self.checkouts,
+            'timeouts': self.timeouts,
+            'avg_wait_ms': self.wait_seconds / self.checkouts * 1000 if self.checkouts else 0.0,
+            'max_wait_ms': self.max_wait_seconds * 1000,
+            'pool_size': pool.size(),
+            'checked_out': pool.checkedout(),
+            'overflow': pool.overflow(),
+        }
+
+
+class TimedQueuePool(QueuePool):
+    """QueuePool recording checkout wait times in its `metrics`"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.metrics = PoolMetrics()
+
+    def recreate(self):
+        # The pool is replaced on dispose and after connection errors, its metrics carry over
+        pool = super().recreate()
+        pool.metrics = self.metrics
+        return pool
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except TimeoutError:
+            self.metrics.record(time.perf_counter() - start, timed_out=True)
+            raise
+        self.metrics.record(time.perf_counter() - start)
+        return connection
@@ -0,0 +1,131 @@
+from datetime import datetime, time, timedelta
+from itertools import groupby
+from operator import attrgetter
+
+from sqlalchemy import func
+
+from . import enums
+from .models import db, Venue, Artist, Show, VenueShowSummary
+
+
+def venue_areas():
+    """
+    Group venues into (city, state) areas with their upcoming show counts, using a single query.
+    Counts are read from the precomputed venue show summaries (see fyyur.summaries).
+
+    --- Grouped query ---
+    # SELECT venue.state, venue.city, venue.id, venue.name, coalesce(summary.upcoming_shows, 0)
+    # FROM venue LEFT OUTER JOIN venue_show_summary summary ON summary.venue_id = venue.id
+    # ORDER BY venue.state, venue.city, venue.name;
+    """
+    rows = db.session.query(
+        Venue.state, Venue.city, Venue.id, Venue.name,
+        func.coalesce(VenueShowSummary.upcoming_shows, 0).label('num_upcoming_shows')
+    ).outerjoin(VenueShowSummary, VenueShowSummary.venue_id == Venue.id) \
+        .order_by(Venue.state, Venue.city, Venue.name)
+
+    # Rows arrive sorted by (state, city), so areas can be streamed without buffering the result
+    areas = []
+    for (state, city), venues in groupby(rows, key=attrgetter('state', 'city')):
+        areas.append({
+            'city': city,
+            'state': state.label,
+            'venues': [{
+                'id': venue.id,
+                'name': venue.name,
+                'num_upcoming_shows': venue.num_upcoming_shows
+            } for venue in venues]
+        })
+    return areas
+
+
+def partner_ids(show_fk, partner_fk, entity_id):
+    """IDs of the other party of every show of an entity, e.g. the artists that played a venue"""
+    return [partner_id for partner_id, in db.session.query(partner_fk).filter(show_fk == entity_id).distinct()]
+
+
+def _entity_detail(model, related, show_fk, related_fk, entity_id, now=None):
+    """
+    Load an entity together with all of its shows (and the other party of each show) in a single query.
+    Shows are partitioned into past and upcoming in memory against one timestamp.
+
+    --- Join query ---
+    # SELECT venue.*, show.start_time, artist.id, artist.name, artist.image_link
+    # FROM venue LEFT OUTER JOIN show ON show.venue_id = venue.id
+    # LEFT OUTER JOIN artist ON artist.id = show.artist_id
+    # WHERE venue.id = :venue_id ORDER BY show.start_time;
+    """
+    now = now or datetime.now()
+    rows = db.session.query(model, Show.start_time, related.id, related.name, related.image_link) \
+        .outerjoin(Show, show_fk == model.id) \
+        .outerjoin(related, related.id == related_fk) \
+        .filter(model.id == entity_id) \
+        .order_by(Show.start_time).all()
+    if not rows:
+        return None
+
+    past_shows, upcoming_shows = [], []
+    for _, start_time, related_id, name, image_link in rows:
+        if start_time is None:  # Entity has no shows, outer join yields a single empty row
+            continue
+        show = {
+            'start_time': start_time,
+            related.__tablename__: {'id': related_id, 'name': name, 'image_link': image_link},
+        }
+        (upcoming_shows if start_time > now else past_shows).append(show)
+
+    return {
+        **rows[0][0].__dict__,
+        'past_shows': past_shows,
+        'upcoming_shows': upcoming_shows,
+        'past_shows_count': len(past_shows),
+        'upcoming_shows_count': len(upcoming_shows),
+    }
+
+
+def venue_detail(venue_id, now=None):
+    return _entity_detail(Venue, Artist, Show.venue_id, Show.artist_id, venue_id, now)
+
+
+def artist_detail(artist_id, now=None):
+    return _entity_detail(Artist, Venue, Show.artist_id, Show.venue_id, artist_id, now)
+
+
+def weekend_range(today):
+    """(Saturday, Sunday) of the current weekend, or the next one on weekdays"""
+    saturday = today + timedelta(days=(5 - today.weekday()) % 7) if today.weekday() < 5 else \
+        today - timedelta(days=today.weekday() - 5)
+    return saturday, saturday + timedelta(days=1)
+
+
+def calendar_filters(args, max_days):
+    """
+    (start, end, state) of calendar request args, defaults to this weekend in all states.
+    Raises ValueError for malformed dates, unknown states and ranges that are reversed or longer than `max_days`.
+    """
+    start, end = weekend_range(datetime.today().date())
+    if args.get('start'):
+        start = datetime.strptime(args['start'], '%Y-%m-%d').date()
+    if args.get('end'):
+        end = datetime.strptime(args['end'], '%Y-%m-%d').date()
+    try:
+        state = enums.State.from_abbr(args['state']) if args.get('state') else None
+    except KeyError:
+        raise ValueError(f"Unknown state {args['state']!r}")
+    if end < start or (end - start).days > max_days:
+        raise ValueError('Invalid date range')
+    return start, end, state
+
+
+def shows_between(start_date, end_date, state=None):
+    """
+    Shows starting on any day from `start_date` to `end_date` (inclusive), optionally only at venues in `state`.
+    The start_time bounds make this a range scan on the show start_time index.
+    """
+    start = datetime.combine(start_date, time.min)
+    # Inclusive bound on the last instant of `end_date`, the next day's midnight overflows on date.max
+    end = datetime.combine(end_date, time.max)
+    shows = Show.query.filter(Show.start_time >= start, Show.start_time <= end)
+    if state is not None:
+        shows = shows.join(Venue, Show.venue_id == Venue.id).filter(Venue.state == state)
+    return shows
@@ -0,0 +1,50 @@
+"""
+Name search for venues and artists, backed by pg_trgm GIN indexes (see migration 8c41d2a7f3b9).
+
+`ILIKE '%term%'` predicates are served by the trigram indexes, results are ranked by trigram similarity and only a
+single page (plus a bounded count) is fetched per request.
+"""
+from sqlalchemy import func
+
+from fyyur import app
+from .models import db
+
+
+def _escape_like(term):
+    return term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+class SearchResults(object):
+    def __init__(self, term, items, page, per_page, total, total_limit):
+        self.term = term
+        self.page = page
+        self.per_page = per_page
+        self.items = items[:per_page]
+        self.has_next = len(items) > per_page
+        self.has_prev = page > 1
+        self.total = total
+        self.total_capped = total >= total_limit  # Count stopped at the limit, there may be more matches
+
+    def __iter__(self):
+        return iter(self.items)
+
+
+def search_names(model, term, page=1, per_page=None):
+    """Return a ranked page of `model` entities whose name contains `term`"""
+    per_page = per_page or app.config['SEARCH_RESULTS_PER_PAGE']
+    total_limit = app.config['SEARCH_COUNT_LIMIT']
+    page = max(page, 1)
+    term = term.strip()
+
+    matches = db.session.query(model.id, model.name) \
+        .filter(model.name.ilike(f'%{_escape_like(term)}%', escape='\\'))
+
+    # Bounded count, so very broad terms do not count the whole table
+    total = db.session.query(func.count()).select_from(matches.limit(total_limit).subquery()).scalar()
+
+    # Fetch one extra row to know whether there is a next page without another count
+    items = matches.order_by(func.similarity(model.name, term).desc(), model.name, model.id) \
+        .offset((page - 1) * per_page) \
+        .limit(per_page + 1).all()
+
+    return SearchResults(term, items, page, per_page, total, total_limit)
@@ -0,0 +1,213 @@
+"""
+Server-side sessions.
+
+Session data (CSRF tokens, flashed messages) is kept in a shared store and the cookie only carries a signed session id,
+so cookies stay small and every worker process sees the same sessions. The id is signed with the SECRET_KEY from the
+environment, which must be the same for all workers.
+
+The store is configured with SESSION_BACKEND (dotted path to a class taking the app config, with `get(sid)`,
+`set(sid, data, ttl)`, `delete(sid)` and `purge()`):
+
+- FilesystemSessionStore (default): one file per session in SESSION_FILE_DIR, shared by the workers of one host.
+- SQLSessionStore: the session_store table, shared by all hosts.
+- MemorySessionStore: in-process, a local stand-in for a shared store such as Redis. Only for single process use.
+
+Expired sessions are dropped when read, `flask purge-sessions` removes the ones that are never read again.
+"""
+import json
+import os
+import secrets
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+from importlib import import_module
+
+import click
+from flask.sessions import SessionInterface, SessionMixin, session_json_serializer
+from itsdangerous import BadSignature, Signer
+from sqlalchemy import delete, select
+from sqlalchemy.dialects.postgresql import insert
+from werkzeug.datastructures import CallbackDict
+
+from fyyur import app
+from .models import db, StoredSession
+
+
+class MemorySessionStore(object):
+    def __init__(self, config):
+        self._sessions = {}
+        self._lock = threading.Lock()
+
+    def get(self, sid):
+        with self._lock:
+            data, expires = self._sessions.get(sid, (None, 0))
+            if expires < time.time():
+                self._sessions.pop(sid, None)
+                return None
+            return data
+
+    def set(self, sid, data, ttl):
+        with self._lock:
+            self._sessions[sid] = (data, time.time() + ttl)
+
+    def delete(self, sid):
+        with self._lock:
+            self._sessions.pop(sid, None)
+
+    def purge(self):
+        now = time.time()
+        with self._lock:
+            expired = [sid for sid, (_, expires) in self._sessions.items() if expires < now]
+            for sid in expired:
+                del self._sessions[sid]
+        return len(expired)
+
+
+class FilesystemSessionStore(object):
+    def __init__(self, config):
+        self.directory = config['SESSION_FILE_DIR']
+        os.makedirs(self.directory, exist_ok=True)
+
+    def _path(self, sid):
+        return os.path.join(self.directory, sid)
+
+    def _read(self, path):
+        try:
+            with open(path) as f:
+                expires, data = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if expires < time.time():
+            self._remove(path)
+            return None
+        return data
+
+    def _remove(self, path):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    def get(self, sid):
+        return self._read(self._path(sid))
+
+    def set(self, sid, data, ttl):
+        # Write and rename, so concurrent readers never see a partial file
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, prefix='.tmp-')
+        with os.fdopen(fd, 'w') as f:
+            json.dump([time.time() + ttl, data], f)
+        os.replace(tmp_path, self._path(sid))
+
+    def delete(self, sid):
+        self._remove(self._path(sid))
+
+    def purge(self):
+        purged = 0
+        for name in os.listdir(self.directory):
+            if not name.startswith('.') and self._read(self._path(name)) is None:
+                purged += 1
+        return purged
+
+
+class SQLSessionStore(object):
+    """
+    Sessions in the session_store table (see migration c5d8a1f3e7b2). Statements run on their own primary connection,
+    outside the request's unit of work and replica routing.
+    """
+
+    def __init__(self, config):
+        self.table = StoredSession.__table__
+
+    def get(self, sid):
+        with db.engine.connect() as connection:
+            row = connection.execute(select([self.table.c.data, self.table.c.expires_at])
+                                     .where(self.table.c.id == sid)).first()
+        if row is None or row.expires_at < datetime.now():
+            return None
+        return row.data
+
+    def set(self, sid, data, ttl):
+        expires_at = datetime.now() + timedelta(seconds=ttl)
+        stmt = insert(self.table).values(id=sid, data=data, expires_at=expires_at)
+        stmt = stmt.on_conflict_do_update(index_elements=['id'], set_={'data': data, 'expires_at': expires_at})
+        with db.engine.begin() as connection:
+            connection.execute(stmt)
+
+    def delete(self, sid):
+        with db.engine.begin() as connection:
+            connection.execute(delete(self.table).where(self.table.c.id == sid))
+
+    def purge(self):
+        with db.engine.begin() as connection:
+            return connection.execute(delete(self.table).where(self.table.c.expires_at < datetime.now())).rowcount
+
+
+class ServerSideSession(CallbackDict, SessionMixin):
+    def __init__(self, initial=None, sid=None, new=False):
+        def on_update(session):
+            session.modified = True
+
+        super().__init__(initial, on_update)
+        self.sid = sid
+        self.new = new
+        self.modified = False
+
+
+class ServerSideSessionInterface(SessionInterface):
+    def __init__(self, store):
+        self.store = store
+
+    def _signer(self, app):
+        return Signer(app.secret_key, salt='fyyur-session')
+
+    def open_session(self, app, request):
+        cookie = request.cookies.get(app.session_cookie_name)
+        if cookie:
+            try:
+                sid = self._signer(app).unsign(cookie).decode()
+            except BadSignature:
+                sid = None
+            data = self.store.get(sid) if sid else None
+            if data is not None:
+                return ServerSideSession(session_json_serializer.loads(data), sid=sid)
+        return ServerSideSession(sid=secrets.token_urlsafe(32), new=True)
+
+    def save_session(self, app, session, response):
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+
+        if not session:
+            # Emptied session, drop it from the store and the client
+            if session.modified and not session.new:
+                self.store.delete(session.sid)
+                response.delete_cookie(app.session_cookie_name, domain=domain, path=path)
+            return
+
+        if not self.should_set_cookie(app, session):
+            return
+
+        ttl = int(app.permanent_session_lifetime.total_seconds())
+        if session.modified:
+            self.store.set(session.sid, session_json_serializer.dumps(dict(session)), ttl)
+        response.set_cookie(
+            app.session_cookie_name, self._signer(app).sign(session.sid).decode(),
+            expires=self.get_expiration_time(app, session), httponly=self.get_cookie_httponly(app),
+            domain=domain, path=path, secure=self.get_cookie_secure(app), samesite=self.get_cookie_samesite(app),
+        )
+
+
+def _load_store(config):
+    module, _, name = config['SESSION_BACKEND'].rpartition('.')
+    return getattr(import_module(module), name)(config)
+
+
+app.session_interface = ServerSideSessionInterface(_load_store(app.config))
+
+
+@app.cli.command('purge-sessions')
+def purge_sessions():
+    """Remove expired server-side sessions."""
+    with app.app_context():
+        purged = app.session_interface.store.purge()
+    click.echo(f'Purged {purged} expired sessions')
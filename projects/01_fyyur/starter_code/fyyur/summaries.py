@@ -0,0 +1,134 @@
+"""
+Incrementally maintained upcoming/past show counters for venues and artists.
+
+Counters are bumped when a show is created, recomputed for the other party when a venue or artist is deleted, and
+rolled forward periodically (`flask roll-show-summaries`) as upcoming shows pass into the past.
+"""
+from datetime import datetime
+
+import click
+from sqlalchemy import func
+from sqlalchemy.dialects.postgresql import insert
+
+from fyyur import app
+from .queries import partner_ids
+from .models import db, Venue, Artist, Show, VenueShowSummary, ArtistShowSummary
+
+# (summary model, summary key column, show foreign key column, entity model)
+VENUE = (VenueShowSummary, VenueShowSummary.venue_id, Show.venue_id, Venue)
+ARTIST = (ArtistShowSummary, ArtistShowSummary.artist_id, Show.artist_id, Artist)
+
+
+def _bump(summary, entity_id, start_time, now):
+    model, key, _, _ = summary
+    table = model.__table__
+    upcoming = start_time > now
+
+    stmt = insert(table).values({
+        key.name: entity_id,
+        'upcoming_shows': int(upcoming),
+        'past_shows': int(not upcoming),
+        'next_show_time': start_time if upcoming else None,
+    })
+    stmt = stmt.on_conflict_do_update(index_elements=[key.name], set_={
+        'upcoming_shows': table.c.upcoming_shows + int(upcoming),
+        'past_shows': table.c.past_shows + int(not upcoming),
+        # LEAST ignores NULLs in postgres
+        'next_show_time': func.least(table.c.next_show_time, stmt.excluded.next_show_time),
+    })
+    db.session.execute(stmt)
+
+
+def record_show(show, now=None):
+    """Count a newly created show against its venue and artist summaries"""
+    now = now or datetime.now()
+    _bump(VENUE, show.venue_id, show.start_time, now)
+    _bump(ARTIST, show.artist_id, show.start_time, now)
+
+
+def refresh(summary, entity_ids, now=None):
+    """Recompute the summaries of the given entities from the show table with one grouped query"""
+    model, key, show_fk, _ = summary
+    entity_ids = set(entity_ids)
+    if not entity_ids:
+        return
+    now = now or datetime.now()
+
+    counts = {entity_id: (0, 0, None) for entity_id in entity_ids}
+    rows = db.session.query(
+        show_fk,
+        func.count(Show.id).filter(Show.start_time > now),
+        func.count(Show.id).filter(Show.start_time <= now),
+        func.min(Show.start_time).filter(Show.start_time > now),
+    ).filter(show_fk.in_(entity_ids)).group_by(show_fk)
+    for entity_id, *row in rows:
+        counts[entity_id] = tuple(row)
+
+    stmt = insert(model.__table__).values([{
+        key.name: entity_id,
+        'upcoming_shows': upcoming,
+        'past_shows': past,
+        'next_show_time': next_show_time,
+    } for entity_id, (upcoming, past, next_show_time) in counts.items()])
+    stmt = stmt.on_conflict_do_update(index_elements=[key.name], set_={
+        'upcoming_shows': stmt.excluded.upcoming_shows,
+        'past_shows': stmt.excluded.past_shows,
+        'next_show_time': stmt.excluded.next_show_time,
+    })
+    db.session.execute(stmt)
+
+
+def roll_forward(now=None):
+    """Move shows that have started since the last roll from upcoming to past. Returns the number of rows updated."""
+    now = now or datetime.now()
+    updated = 0
+    for summary in (VENUE, ARTIST):
+        model, key, _, _ = summary
+        stale = [entity_id for entity_id, in db.session.query(key).filter(model.next_show_time <= now)]
+        refresh(summary, stale, now)
+        updated += len(stale)
+    return updated
+
+
+def _remove(summary, other, session, entity_id):
+    _, _, show_fk, model = summary
+    _, _, other_fk, _ = other
+    # Shows of the deleted entity are cascaded, so the other side of each show must be recounted
+    other_ids = partner_ids(show_fk, other_fk, entity_id)
+    # Shows and the own summary row are removed by ON DELETE CASCADE, without loading them into the session
+    session.query(model).filter(model.id == entity_id).delete(synchronize_session=False)
+    refresh(other, other_ids)
+
+
+def remove_venue(session, venue_id):
+    """Delete a venue and recount the artists that had shows there"""
+    _remove(VENUE, ARTIST, session, venue_id)
+
+
+def remove_artist(session, artist_id):
+    """Delete an artist and recount the venues they had shows at"""
+    _remove(ARTIST, VENUE, session, artist_id)
+
+
+# ----------------------------------------------------------------------------#
+# Commands.
+# ----------------------------------------------------------------------------#
+
+@app.cli.command('roll-show-summaries')
+def roll_show_summaries():
+    """Periodic job (e.g. cron): roll passed shows from upcoming to past."""
+    with app.app_context():
+        updated = roll_forward()
+        db.session.commit()
+    click.echo(f'Rolled forward {updated} show summaries')
+
+
+@app.cli.command('rebuild-show-summaries')
+def rebuild_show_summaries():
+    """Recompute every venue and artist show summary from scratch."""
+    with app.app_context():
+        for summary in (VENUE, ARTIST):
+            _, _, _, entity = summary
+            refresh(summary, [entity_id for entity_id, in db.session.query(entity.id)])
+        db.session.commit()
+    click.echo('Rebuilt show summaries')
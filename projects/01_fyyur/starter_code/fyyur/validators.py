@@ -1,16 +1,61 @@
-from us import states
+import json
+import os
+import re
+from functools import lru_cache
+
+import click
 import phonenumbers
-from phonenumbers.geodata import data0, data1, data2, data3
-from phonenumbers.prefix import _prefix_description_for_number
+from us import states
 from wtforms.validators import ValidationError
 
+from fyyur import app
 from .enums import State
 
-# Compile all US prefix mappings
-# Only compile the geodata we require for US regions (1XXX) to avoid excessive memory required for metadata
-US_PHONE_GEODATA = {}
-for data in [data0, data1, data2, data3]:
-    US_PHONE_GEODATA.update(data.data)
+# Precomputed US area code -> state abbreviation table, built by `flask build-area-codes`
+AREA_CODES_PATH = os.path.join(os.path.dirname(__file__), 'data', 'us_area_codes.json')
+
+# Geodata descriptions that do not resolve through `us.states.lookup`
+STATE_ALIASES = {
+    'Washington State': 'WA',
+    'Washington D.C.': 'DC',
+    'Philadelphia': 'PA',
+}
+
+
+def build_area_code_table():
+    """
+    Compile the area code -> state abbreviation table from the phonenumbers geodata.
+    Only the 3 digit US area code prefixes (1XXX) are used, each resolved to a state from its description: a state
+    name, a city description ending in a state abbreviation (e.g. 'San Antonio, TX'), or one of STATE_ALIASES.
+    Longer (exchange level) prefixes and descriptions that resolve to no state are skipped.
+    """
+    from phonenumbers.geodata import data0, data1, data2, data3
+
+    table = {}
+    for data in [data0, data1, data2, data3]:
+        for prefix, descriptions in data.data.items():
+            if len(prefix) != 4 or not prefix.startswith('1') or 'en' not in descriptions:
+                continue
+            description = str(descriptions['en'])
+            abbr = STATE_ALIASES.get(description)
+            if abbr is None:
+                match = re.search(r', ([A-Z]{2})$', description)  # e.g. 'San Antonio, TX'
+                lookup_state = states.lookup(match.group(1) if match else description)
+                abbr = lookup_state.abbr if lookup_state else None
+            if abbr in State.__members__:
+                table[prefix[1:]] = abbr
+    return dict(sorted(table.items()))
+
+
+@lru_cache(maxsize=None)
+def area_code_states():
+    """Area code -> State table, loaded once from the on-disk artifact (or compiled if it is missing)"""
+    try:
+        with open(AREA_CODES_PATH) as f:
+            table = json.load(f)
+    except FileNotFoundError:
+        table = build_area_code_table()
+    return {area_code: State[abbr] for area_code, abbr in table.items()}
 
 
 class GeoValidateUsPhone(object):
@@ -31,13 +76,17 @@ class GeoValidateUsPhone(object):
             raise ValidationError(self.ERROR_MSG)
 
         # Check area prefix is valid for US states, and matches the selected state
-        longest_prefix = 4  # Only return results for state name description (1XXX) (excl. city names)
-        _state = _prefix_description_for_number(US_PHONE_GEODATA, longest_prefix, phone, 'en')
-        try:
-            assert _state
-            lookup_state = states.lookup(_state)
-            assert lookup_state
-            state = State[lookup_state.abbr]  # Raise Key error if state abbreviation not in local states
-            assert state == form_state  # Check that specified state same as parsed state
-        except (AssertionError, KeyError):
+        area_code = str(phone.national_number)[:3]
+        state = area_code_states().get(area_code) if phone.country_code == 1 else None
+        if state != form_state:
             raise ValidationError('Invalid area code prefix')
+
+
+@app.cli.command('build-area-codes')
+def build_area_codes():
+    """Regenerate the area code -> state artifact used by GeoValidateUsPhone."""
+    table = build_area_code_table()
+    os.makedirs(os.path.dirname(AREA_CODES_PATH), exist_ok=True)
+    with open(AREA_CODES_PATH, 'w') as f:
+        json.dump(table, f, separators=(',', ':'))
+    click.echo(f'Wrote {len(table)} area codes to {AREA_CODES_PATH}')
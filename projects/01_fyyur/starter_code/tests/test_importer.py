@@ -0,0 +1,56 @@
+import os
+from unittest import TestCase
+
+os.environ.setdefault('DB_NAME', 'fyyur_test')
+
+import psycopg2
+
+from fyyur import app
+from fyyur.config import Config
+from fyyur.importer import import_rows
+from fyyur.models import db, Artist
+
+
+def create_database():
+    """Create the test database if it does not exist yet"""
+    connection = psycopg2.connect(dbname='postgres', user=Config.DB_USER, password=Config.DB_PASSWORD,
+                                  host=Config.DB_HOST, port=Config.DB_PORT)
+    connection.autocommit = True
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT 1 FROM pg_database WHERE datname = %s', (Config.DB_NAME,))
+        if cursor.fetchone() is None:
+            cursor.execute(f'CREATE DATABASE {Config.DB_NAME}')
+    connection.close()
+
+
+class ImportRowsTestCase(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        create_database()
+
+    def setUp(self):
+        self.request_context = app.test_request_context()
+        self.request_context.push()
+        db.drop_all()
+        db.create_all()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.request_context.pop()
+
+    def artist(self, name, city='San Francisco'):
+        return {'name': name, 'city': city, 'state': 'CA', 'phone': '415-555-0100', 'genres': ['Jazz']}
+
+    def test_rejected_row_does_not_abort_the_load(self):
+        """Test that a row the database rejects is reported and the other rows of its chunk are imported"""
+        rows = [self.artist('First'), self.artist('Too long', city='x' * 200), self.artist('Third')]
+        errors = {}
+
+        imported = import_rows('artists', rows, chunk_size=10, on_error=errors.__setitem__)
+
+        assert imported == 2
+        assert list(errors) == [2]
+        assert 'too long' in errors[2]['row'][0]
+        assert sorted(name for name, in db.session.query(Artist.name)) == ['First', 'Third']
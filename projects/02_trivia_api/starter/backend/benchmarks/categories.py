@@ -0,0 +1,141 @@
+"""
+Category cache benchmark: the routes that read categories, driven through the Flask test client with the category
+cache on and off (CATEGORY_CACHE_TTL=-1 reloads the categories on every use, as before the cache).
+
+Reports p50/p95 latency and queries per request of each route, and the latency reduction of the cache. Runs against a
+dedicated local Postgres database (DB_NAME, default trivia_bench), which is created and seeded.
+
+    python -m benchmarks.categories --questions 10000 --requests 500
+"""
+import argparse
+import json
+import os
+import random
+import time
+
+os.environ.setdefault('DB_NAME', 'trivia_bench')
+
+import psycopg2
+from sqlalchemy import event
+
+from config import Config
+from flaskr import create_app
+from flaskr.models import Category, Question, db
+
+PERCENTILES = (50, 95)
+CATEGORIES = ('Science', 'Art', 'Geography', 'History', 'Entertainment', 'Sports')
+
+
+class BenchConfig(Config):
+    SQLALCHEMY_BINDS = {}  # Primary only, replica routing is not measured here
+
+
+class UncachedBenchConfig(BenchConfig):
+    CATEGORY_CACHE_TTL = -1
+
+
+def create_database():
+    """Create the benchmark database if it does not exist yet"""
+    connection = psycopg2.connect(dbname='postgres', user=Config.DB_USER, password=Config.DB_PASSWORD,
+                                  host=Config.DB_HOST, port=Config.DB_PORT)
+    connection.autocommit = True
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT 1 FROM pg_database WHERE datname = %s', (Config.DB_NAME,))
+        if cursor.fetchone() is None:
+            cursor.execute(f'CREATE DATABASE {Config.DB_NAME}')
+    connection.close()
+
+
+def seed(questions, rng):
+    db.drop_all()
+    db.create_all()
+    categories = [Category(type_) for type_ in CATEGORIES]
+    db.session.add_all(categories)
+    db.session.flush()
+    db.session.bulk_save_objects([
+        Question(f'Question {n}?', f'Answer {n}', rng.choice(categories).id, rng.randint(1, 5))
+        for n in range(questions)
+    ])
+    db.session.commit()
+    return [category.id for category in categories]
+
+
+def routes(category_ids, rng):
+    """Benchmarked routes: name, method, and a function returning the url and JSON body of a request"""
+    return [
+        ('categories', 'GET', lambda: ('/api/categories', None)),
+        ('questions', 'GET', lambda: (f'/api/questions?page={rng.randint(1, 10)}', None)),
+        ('category_questions', 'GET', lambda: (f'/api/categories/{rng.choice(category_ids)}/questions', None)),
+        ('create_question', 'POST', lambda: ('/api/questions', {
+            'question': 'Benchmark question?', 'answer': 'Yes', 'category': rng.choice(category_ids), 'difficulty': 3,
+        })),
+    ]
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))]
+
+
+def run_route(app, method, request_args, requests):
+    client = app.test_client()
+    queries = []
+
+    def count_query(*args):
+        queries.append(args[2])
+
+    event.listen(db.engine, 'before_cursor_execute', count_query)
+
+    latencies = []
+    for _ in range(requests):
+        url, body = request_args()
+        start = time.perf_counter()
+        resp = client.open(url, method=method, json=body)
+        latencies.append((time.perf_counter() - start) * 1000)
+        assert resp.status_code < 400, (url, resp.status_code, resp.data)
+
+    event.remove(db.engine, 'before_cursor_execute', count_query)
+    return {
+        **{f'p{p}_ms': round(percentile(latencies, p), 3) for p in PERCENTILES},
+        'queries_per_request': round(len(queries) / requests, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--questions', type=int, default=10000)
+    parser.add_argument('--requests', type=int, default=500, help='Requests per route and mode')
+    parser.add_argument('--seed', type=int, default=0, help='Random seed of the dataset and requests')
+    parser.add_argument('--output', help='Also write the results to this JSON file')
+    args = parser.parse_args()
+
+    create_database()
+    rng = random.Random(args.seed)
+    with create_app(BenchConfig).app_context():
+        category_ids = seed(args.questions, rng)
+
+    results = {}
+    for mode, config_class in (('uncached', UncachedBenchConfig), ('cached', BenchConfig)):
+        app = create_app(config_class)
+        with app.app_context():
+            for name, method, request_args in routes(category_ids, random.Random(args.seed)):
+                run_route(app, method, request_args, min(args.requests, 20))  # Warm up
+                results.setdefault(name, {})[mode] = run_route(app, method, request_args, args.requests)
+            db.session.remove()
+
+    print(f"{'route':<20}{'mode':<10}{'p50 ms':>10}{'p95 ms':>10}{'queries':>10}")
+    for name, modes in results.items():
+        for mode, result in modes.items():
+            print(f"{name:<20}{mode:<10}{result['p50_ms']:>10.3f}{result['p95_ms']:>10.3f}"
+                  f"{result['queries_per_request']:>10.2f}")
+        reduction = 1 - modes['cached']['p50_ms'] / modes['uncached']['p50_ms']
+        modes['p50_reduction'] = round(reduction, 3)
+        print(f"{'':<20}{'p50 reduction':<20}{reduction:>9.1%}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'args': vars(args), 'results': results}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,6 +1,7 @@
 import os
 
 from dotenv import load_dotenv
+from replica_routing import replica_binds
 
 
 basedir = os.path.abspath(os.path.dirname(__file__))
@@ -30,8 +31,28 @@ class Config(object):
     # Silence the deprecation warning
     SQLALCHEMY_TRACK_MODIFICATIONS = False
 
+    # Read replicas, see replica_routing
+    SQLALCHEMY_BINDS = replica_binds(env('DB_REPLICA_URIS', default=''))
+    REPLICA_LAG_WINDOW = int(env('REPLICA_LAG_WINDOW', default=5))  # Seconds a client reads from the primary after a write
+    REPLICA_HEALTH_INTERVAL = int(env('REPLICA_HEALTH_INTERVAL', default=10))  # Seconds between replica health checks
+    REPLICA_MAX_LAG = int(env('REPLICA_MAX_LAG', default=30))  # Seconds of replay lag before a replica is skipped
+
+    # Categories
+    CATEGORY_CACHE_TTL = int(env('CATEGORY_CACHE_TTL', default=60))  # Seconds before the category cache is reloaded
+
+    # Quizzes
+    QUIZ_INDEX_TTL = int(env('QUIZ_INDEX_TTL', default=300))  # Seconds before the quiz question index is reloaded
+    QUIZ_SESSION_BACKEND = env('QUIZ_SESSION_BACKEND', default='flaskr.quiz.MemoryQuizSessionStore')
+    QUIZ_SESSION_TTL = int(env('QUIZ_SESSION_TTL', default=3600))  # Seconds a quiz session is kept
+
+    # Search
+    SEARCH_MAX_RESULTS = int(env('SEARCH_MAX_RESULTS', default=1000))  # Matches ranked per search, see flaskr.search
+
     # Pagination
     POSTS_PER_PAGE = env('POSTS_PER_PAGE', 10)
+    PAGINATION_COUNT = env('PAGINATION_COUNT', default='exact')  # exact or approximate, see flaskr.pagination
+    APPROXIMATE_COUNT_MIN_ROWS = int(env('APPROXIMATE_COUNT_MIN_ROWS', default=10000))  # Smaller tables are counted
+    PAGINATION_COUNT_TTL = int(env('PAGINATION_COUNT_TTL', default=60))  # Seconds approximate filtered counts are cached
 
 
 class DevelopmentConfig(Config):
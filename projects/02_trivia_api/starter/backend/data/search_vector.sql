@@ -0,0 +1,9 @@
+-- Full-text search column and indexes of the questions (flaskr.search), for databases restored from trivia.psql.
+-- Requires Postgres 12+. New databases created by the app get them from flaskr.models.SEARCH_VECTOR_DDL.
+
+ALTER TABLE public.questions ADD COLUMN search_vector tsvector GENERATED ALWAYS AS (
+    setweight(to_tsvector('simple', coalesce(question, '')), 'A') ||
+    setweight(to_tsvector('simple', coalesce(answer, '')), 'B')
+) STORED;
+CREATE INDEX questions_search_vector_idx ON public.questions USING gin (search_vector);
+CREATE INDEX questions_category_idx ON public.questions (category);
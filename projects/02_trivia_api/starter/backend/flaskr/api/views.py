@@ -1,28 +1,35 @@
-import random
-
-from flask import jsonify, request, abort, current_app
+from flask import jsonify, request, abort
 
 from flaskr.api import api
-from flaskr.models import Question, Category, db_session
+from flaskr.categories import category_cache
+from flaskr.models import Question, db_session
+from flaskr.pagination import paginate_query
+from flaskr.quiz import next_question, next_session_question, quiz_session_store, start_quiz
+from flaskr.search import highlights, search_questions as questions_search, truncated
+
+
+def questions_page(query):
+    """Paginated questions of a query and their total, plus the cursor of the next page when paginating by `after`"""
+    return format_questions_page(paginate_query(request, query, key=Question.id))
 
 
-def paginate_query(req, query):
-    """Paginate a SQLAlcehmy query"""
-    page = req.args.get('page', 1, type=int)
-    return query.paginate(page, current_app.config['POSTS_PER_PAGE']).items
+def format_questions_page(page):
+    data = {
+        'questions': [question.format() for question in page.items],
+        'total_questions': page.total,
+    }
+    if 'after' in request.args:
+        data['next_after'] = page.next_after
+    return data
 
 
 @api.route('/questions')
 def questions():
-    questions = Question.query
-    pag_query = questions.order_by(Question.id)
-    pag_questions = paginate_query(request, pag_query)
-    categories = Category.query.order_by(Category.type)
+    pag_query = Question.query.order_by(Question.id)
 
     return jsonify({
-        'questions': [question.format() for question in pag_questions],
-        'total_questions': questions.count(),
-        'categories': {category.id: category.type for category in categories.all()},
+        **questions_page(pag_query),
+        'categories': category_cache().types(),
     }), 200
 
 
@@ -55,8 +62,7 @@ def create_question():
     if fields['difficulty'] <= 0 or fields['difficulty'] > 5:
         errors.append({'difficulty': 'Difficulty must be an integer between 1 and 5'})
 
-    category = Category.query.get(int(fields['category']))
-    if not category:
+    if category_cache().get(int(fields['category'])) is None:
         errors.append({'category': 'Category is not supported'})
 
     if errors:
@@ -92,47 +98,38 @@ def search_questions():
     search_term = data.get('searchTerm', '')
     category_id = data.get('categoryId', None)
 
-    questions_categories = Question.query.join(Category, Question.category == Category.id)
-
-    if category_id:
-        questions_categories = questions_categories.filter(Question.category == category_id)
+    # Results are ordered by rank, which an id cursor cannot follow
+    if 'after' in request.args:
+        abort(400, 'Search results are paginated by page, not by after')
 
-    search = questions_categories.filter(
-        Question.question.ilike(f'%{search_term}%')  # question contains
-        | Question.answer.ilike(f'%{search_term}%')  # answer contains
-        | Category.type.ilike(f'%{search_term}%')  # category contains
-    )
+    page = paginate_query(request, questions_search(search_term, category_id))
+    resp = format_questions_page(page)
+    resp['truncated'] = truncated(search_term, category_id, page.total)
 
-    pag_search = paginate_query(request, search)
+    # Question and answer text with the matching words marked, on request
+    if data.get('highlight'):
+        resp['highlights'] = highlights(page.items, search_term)
 
-    return jsonify({
-        'questions': [question.format() for question in pag_search],
-        'total_questions': search.count(),  # TODO: Test count
-    }), 200
+    return jsonify(resp), 200
 
 
 @api.route('/categories')
 def categories():
-    categories = Category.query.order_by(Category.type)
-
     return jsonify({
-        'categories': {category.id: category.type for category in categories.all()}
+        'categories': category_cache().types()
     }), 200
 
 
 @api.route('/categories/<int:cat_id>/questions')
 def category_questions(cat_id):
-    category = Category.query.filter_by(id=cat_id) \
-        .first_or_404('Category matching the provided ID was not found')
+    if category_cache().get(cat_id) is None:
+        abort(404, 'Category matching the provided ID was not found')
 
-    questions = Question.query
-    category_questions = questions.filter(Question.category == cat_id)
-    pag_questions = paginate_query(request, category_questions)
+    category_questions = Question.query.filter(Question.category == cat_id)
 
     return jsonify({
-        'questions': [question.format() for question in pag_questions],
-        'total_questions': category_questions.count(),  # TODO: Test count
-        'current_category': category.id,
+        **questions_page(category_questions),
+        'current_category': cat_id,
     }), 200
 
 
@@ -142,18 +139,41 @@ def quiz_question():
     category_id = data.get('quiz_category')
     exclude_questions = data.get('previous_questions', [])
 
-    # Filter by remaining questions and category
-    questions = Question.query.filter(Question.id.notin_(exclude_questions))
-    if category_id:
-        questions = questions.filter_by(category=category_id)
+    # Random remaining question of the category, picked from the in-memory question index
+    question = next_question(int(category_id) if category_id else None, exclude_questions)
 
-    # Randomize
-    total_questions = questions.count()
-    rand_offset = random.randint(0, total_questions - 1) if total_questions else 0
+    return jsonify({
+        'question': question.format() if question else None
+    }), 200
 
-    # Fetch question
-    question = questions.offset(rand_offset).first()
+
+@api.route('/quizzes/sessions', methods=['POST'])
+def create_quiz_session():
+    data = request.get_json() or {}
+    category_id = data.get('quiz_category')
+
+    quiz_session, total_questions = start_quiz(int(category_id) if category_id else None)
+
+    return jsonify({
+        'quiz_session': quiz_session,
+        'total_questions': total_questions,
+    }), 201
+
+
+@api.route('/quizzes/sessions/<quiz_session>/next', methods=['POST'])
+def quiz_session_question(quiz_session):
+    try:
+        question = next_session_question(quiz_session)
+    except KeyError:
+        abort(404, 'Quiz session matching the provided ID was not found or has expired')
 
     return jsonify({
         'question': question.format() if question else None
     }), 200
+
+
+@api.route('/quizzes/sessions/<quiz_session>', methods=['DELETE'])
+def delete_quiz_session(quiz_session):
+    quiz_session_store().delete(quiz_session)
+
+    return jsonify({}), 204
@@ -0,0 +1,76 @@
+"""
+Category cache.
+
+Categories are read on most requests (question listings, creation checks) but almost never change, so they are loaded
+once into memory and served from there. Category changes committed by this process bump the cache version, which
+reloads it on next use; changes made by other processes are picked up after CATEGORY_CACHE_TTL seconds.
+"""
+import threading
+import time
+
+from flask import current_app, has_app_context
+from replica_routing import RoutingSession
+from sqlalchemy import event
+
+from .models import Category, db
+
+
+class CategoryCache(object):
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self.version = 0
+        self._loaded_version = None
+        self._loaded_at = 0
+        self._types = {}
+        self._lock = threading.Lock()
+
+    def _load(self):
+        version = self.version
+        categories = db.session.query(Category.id, Category.type).order_by(Category.type).all()
+        # A change committed while loading leaves the version ahead, so the next read loads again
+        self._types = {category_id: type_ for category_id, type_ in categories}
+        self._loaded_version = version
+        self._loaded_at = time.monotonic()
+
+    def types(self):
+        """Category types by id, ordered by type. Must not be modified"""
+        with self._lock:
+            if self._loaded_version != self.version or time.monotonic() - self._loaded_at > self.ttl:
+                self._load()
+            return self._types
+
+    def get(self, category_id):
+        """Type of the category, None if it does not exist"""
+        return self.types().get(category_id)
+
+    def invalidate(self):
+        self.version += 1
+
+
+def category_cache():
+    """The app's category cache"""
+    cache = current_app.extensions.get('category_cache')
+    if cache is None:
+        cache = current_app.extensions['category_cache'] = CategoryCache(current_app.config['CATEGORY_CACHE_TTL'])
+    return cache
+
+
+# Invalidate the cache when category changes are committed
+
+@event.listens_for(RoutingSession, 'after_flush')
+def _track_categories(session, flush_context):
+    if any(isinstance(obj, Category) for obj in (*session.new, *session.dirty, *session.deleted)):
+        session.info['categories_changed'] = True
+
+
+@event.listens_for(RoutingSession, 'after_commit')
+def _invalidate_categories(session):
+    changed = session.info.pop('categories_changed', False)
+    cache = current_app.extensions.get('category_cache') if has_app_context() else None
+    if changed and cache is not None:
+        cache.invalidate()
+
+
+@event.listens_for(RoutingSession, 'after_rollback')
+def _discard_category_changes(session):
+    session.info.pop('categories_changed', None)
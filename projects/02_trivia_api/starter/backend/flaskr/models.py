@@ -1,9 +1,10 @@
 from contextlib import contextmanager
 
-from flask_sqlalchemy import SQLAlchemy
-from sqlalchemy import Column, String, Integer
+from replica_routing import RoutingSQLAlchemy
+from sqlalchemy import Column, DDL, String, Integer, event
 
-db = SQLAlchemy()
+
+db = RoutingSQLAlchemy()
 
 
 def setup_db(app=None):
@@ -18,6 +19,7 @@ def setup_db(app=None):
 def db_session():
     """Provide a transactional scope around a series of operations."""
     session = db.session
+    session.info['primary'] = True  # Read and write on the primary from here on
     try:
         yield session
     except:
@@ -77,3 +79,16 @@ class Question(db.Model):
             'category': self.category,
             'difficulty': self.difficulty
         }
+
+
+# Full-text search column and indexes of the questions, see flaskr.search and data/search_vector.sql
+SEARCH_VECTOR_DDL = """
+ALTER TABLE questions ADD COLUMN search_vector tsvector GENERATED ALWAYS AS (
+    setweight(to_tsvector('simple', coalesce(question, '')), 'A') ||
+    setweight(to_tsvector('simple', coalesce(answer, '')), 'B')
+) STORED;
+CREATE INDEX questions_search_vector_idx ON questions USING gin (search_vector);
+CREATE INDEX questions_category_idx ON questions (category);
+"""
+
+event.listen(Question.__table__, 'after_create', DDL(SEARCH_VECTOR_DDL).execute_if(dialect='postgresql'))
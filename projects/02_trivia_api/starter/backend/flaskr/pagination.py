@@ -0,0 +1,117 @@
+"""
+Query pagination.
+
+`paginate_query` returns a page of items together with the total number of results, running at most one count per
+request (none when the page shows it is the last one). Pages are selected with `?page=<n>`, or, for queries paginated
+on a key column, with `?after=<key>` (keyset pagination: `WHERE key > :after ORDER BY key LIMIT n`, which stays fast
+on deep pages where OFFSET has to skip every earlier row).
+
+PAGINATION_COUNT sets how totals are counted:
+
+- exact (default): `SELECT count(*)` of the query.
+- approximate: whole table counts use the planner's estimate (pg_class.reltuples) once the table holds more than
+  APPROXIMATE_COUNT_MIN_ROWS rows, filtered counts are cached for PAGINATION_COUNT_TTL seconds.
+"""
+import threading
+import time
+from collections import namedtuple
+
+from flask import abort, current_app
+from sqlalchemy import Table, text
+
+from .models import db
+
+RELTUPLES = text("SELECT reltuples::bigint FROM pg_class WHERE oid = to_regclass(:table)")
+
+# Cached counts kept before the cache is swept of expired entries
+COUNT_CACHE_SIZE = 1024
+
+Page = namedtuple('Page', 'items total next_after')
+
+
+class CountCache(object):
+    def __init__(self):
+        self._counts = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            count, expires = self._counts.get(key, (None, 0))
+        return count if expires > time.monotonic() else None
+
+    def set(self, key, count, ttl):
+        now = time.monotonic()
+        with self._lock:
+            if len(self._counts) >= COUNT_CACHE_SIZE:
+                self._counts = {k: v for k, v in self._counts.items() if v[1] > now}
+                if len(self._counts) >= COUNT_CACHE_SIZE:
+                    self._counts.clear()
+            self._counts[key] = (count, now + ttl)
+
+
+def _count_cache():
+    cache = current_app.extensions.get('count_cache')
+    if cache is None:
+        cache = current_app.extensions['count_cache'] = CountCache()
+    return cache
+
+
+def _whole_table(query):
+    """The table `query` selects every row of, or None if it is filtered or joined"""
+    froms = query.statement.froms
+    if query.whereclause is None and len(froms) == 1 and isinstance(froms[0], Table):
+        return froms[0]
+    return None
+
+
+def count_query(query):
+    """Number of results of a SQLAlchemy query, exact or approximate depending on PAGINATION_COUNT"""
+    query = query.order_by(None)
+    if current_app.config['PAGINATION_COUNT'] != 'approximate':
+        return query.count()
+
+    table = _whole_table(query)
+    if table is not None:
+        estimate = db.session.execute(RELTUPLES, {'table': table.fullname}).scalar()
+        # Small or never analyzed (-1) tables are counted, their estimates are unreliable
+        if estimate is not None and estimate > current_app.config['APPROXIMATE_COUNT_MIN_ROWS']:
+            return estimate
+        return query.count()
+
+    compiled = query.statement.compile()
+    key = (str(compiled), tuple(sorted((k, repr(v)) for k, v in compiled.params.items())))
+    cache = _count_cache()
+    count = cache.get(key)
+    if count is None:
+        count = query.count()
+        cache.set(key, count, current_app.config['PAGINATION_COUNT_TTL'])
+    return count
+
+
+def paginate_query(req, query, key=None):
+    """
+    Paginate a SQLAlchemy query by `?page=<n>`, or by `?after=<key>` if the query is paginated on the `key` column.
+    Returns the page items, the total number of results, and the key to request the next page after (keyset
+    pagination only, None on the last page).
+    """
+    per_page = int(current_app.config['POSTS_PER_PAGE'])
+
+    after = req.args.get('after', type=int) if key is not None else None
+    if after is not None:
+        items = query.filter(key > after).order_by(None).order_by(key).limit(per_page).all()
+        next_after = getattr(items[-1], key.key) if len(items) == per_page else None
+        return Page(items, count_query(query), next_after)
+
+    page = req.args.get('page', 1, type=int)
+    if page < 1:
+        abort(404)
+    items = query.limit(per_page).offset((page - 1) * per_page).all()
+    if not items and page != 1:
+        abort(404)
+
+    # A partial page is the last one, so the total is known without counting
+    if len(items) < per_page:
+        total = (page - 1) * per_page + len(items)
+    else:
+        total = count_query(query)
+    return Page(items, total, None)
@@ -0,0 +1,230 @@
+"""
+Quiz question selection.
+
+QuestionIndex keeps the question ids of every category in memory, so a quiz question is picked by sampling an unseen
+id and fetching that single row by primary key, instead of counting and offsetting over `NOT IN (previous_questions)`.
+
+The index is loaded on first use and follows the question inserts/deletes committed by this process. It is reloaded
+every QUIZ_INDEX_TTL seconds to pick up changes made by other processes, ids of rows deleted elsewhere are dropped
+when they fail to load.
+
+Quiz sessions hold the shuffled question ids of one quiz, so clients no longer resend their previous questions: each
+next question pops one id from the session. Sessions are kept in the store configured by QUIZ_SESSION_BACKEND (dotted
+path to a class taking the app config, with `create(question_ids, ttl)`, `pop(sid)`, `delete(sid)` and `purge()`).
+MemoryQuizSessionStore keeps them in process and is only for single process use.
+"""
+import random
+import secrets
+import threading
+import time
+from array import array
+from importlib import import_module
+
+from flask import current_app, has_app_context
+from replica_routing import RoutingSession
+from sqlalchemy import event
+
+from .models import db, Question
+
+# Random picks before falling back to scanning the category for unseen ids (quizzes that have seen most of it)
+SAMPLE_ATTEMPTS = 8
+
+
+class IdSet(object):
+    """Set of ids with O(1) add, remove and uniform random choice"""
+
+    def __init__(self):
+        self.ids = []
+        self.positions = {}
+
+    def __len__(self):
+        return len(self.ids)
+
+    def add(self, id_):
+        if id_ not in self.positions:
+            self.positions[id_] = len(self.ids)
+            self.ids.append(id_)
+
+    def discard(self, id_):
+        position = self.positions.pop(id_, None)
+        if position is None:
+            return
+        # Move the last id into the hole
+        last = self.ids.pop()
+        if last != id_:
+            self.ids[position] = last
+            self.positions[last] = position
+
+    def choice(self):
+        return random.choice(self.ids)
+
+
+class QuestionIndex(object):
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self._categories = {}  # category id: IdSet, None: every question
+        self._loaded_at = None
+        self._lock = threading.RLock()
+
+    def _load(self):
+        categories = {None: IdSet()}
+        for question_id, category in db.session.query(Question.id, Question.category):
+            categories[None].add(question_id)
+            categories.setdefault(category, IdSet()).add(question_id)
+        self._categories = categories
+        self._loaded_at = time.monotonic()
+
+    def _ids(self, category):
+        if self._loaded_at is None or time.monotonic() - self._loaded_at > self.ttl:
+            self._load()
+        return self._categories.get(category or None) or IdSet()
+
+    def add(self, question_id, category):
+        with self._lock:
+            if self._loaded_at is not None:
+                self._categories[None].add(question_id)
+                self._categories.setdefault(category, IdSet()).add(question_id)
+
+    def discard(self, question_id, category=None):
+        with self._lock:
+            for ids in self._categories.values() if category is None else \
+                    [self._categories.get(None), self._categories.get(category)]:
+                if ids is not None:
+                    ids.discard(question_id)
+
+    def shuffled(self, category):
+        """Ids of the questions in `category` (any category if falsy), in random order"""
+        with self._lock:
+            ids = list(self._ids(category).ids)
+        random.shuffle(ids)
+        return ids
+
+    def sample(self, category, exclude):
+        """Random id of a question in `category` (any category if falsy) that is not in `exclude`, or None"""
+        with self._lock:
+            ids = self._ids(category)
+            exclude = set(exclude)
+            for _ in range(SAMPLE_ATTEMPTS):
+                if not ids:
+                    return None
+                question_id = ids.choice()
+                if question_id not in exclude:
+                    return question_id
+            remaining = [question_id for question_id in ids.ids if question_id not in exclude]
+            return random.choice(remaining) if remaining else None
+
+
+class MemoryQuizSessionStore(object):
+    # Seconds between sweeps of the expired sessions
+    PURGE_INTERVAL = 60
+
+    def __init__(self, config):
+        self._sessions = {}
+        self._lock = threading.Lock()
+        self._purged_at = time.monotonic()
+
+    def create(self, question_ids, ttl):
+        """Store a quiz of `question_ids` (asked in order) and return its session id"""
+        sid = secrets.token_urlsafe(16)
+        # Reversed, so the next question is popped off the end
+        deck = array('q', reversed(question_ids))
+        with self._lock:
+            self._sessions[sid] = (deck, time.monotonic() + ttl)
+        if time.monotonic() - self._purged_at > self.PURGE_INTERVAL:
+            self.purge()
+        return sid
+
+    def pop(self, sid):
+        """Next question id of the session, None when the quiz is over. Raises KeyError for unknown or expired ids"""
+        with self._lock:
+            deck, expires = self._sessions[sid]
+            if expires < time.monotonic():
+                del self._sessions[sid]
+                raise KeyError(sid)
+            return deck.pop() if deck else None
+
+    def delete(self, sid):
+        with self._lock:
+            self._sessions.pop(sid, None)
+
+    def purge(self):
+        now = time.monotonic()
+        with self._lock:
+            expired = [sid for sid, (_, expires) in self._sessions.items() if expires < now]
+            for sid in expired:
+                del self._sessions[sid]
+            self._purged_at = now
+        return len(expired)
+
+
+def question_index():
+    """The app's question index"""
+    index = current_app.extensions.get('question_index')
+    if index is None:
+        index = current_app.extensions['question_index'] = QuestionIndex(current_app.config['QUIZ_INDEX_TTL'])
+    return index
+
+
+def quiz_session_store():
+    """The app's quiz session store"""
+    store = current_app.extensions.get('quiz_session_store')
+    if store is None:
+        module, _, name = current_app.config['QUIZ_SESSION_BACKEND'].rpartition('.')
+        store = current_app.extensions['quiz_session_store'] = getattr(import_module(module), name)(current_app.config)
+    return store
+
+
+def next_question(category, previous_questions):
+    """A random question of `category` (any category if falsy) that is not in `previous_questions`, or None"""
+    index = question_index()
+    while True:
+        question_id = index.sample(category, previous_questions)
+        if question_id is None:
+            return None
+        question = Question.query.get(question_id)
+        if question is not None:
+            return question
+        index.discard(question_id)  # Deleted by another process
+
+
+def start_quiz(category):
+    """Start a quiz of the questions in `category` (any category if falsy), returns the session id and its length"""
+    question_ids = question_index().shuffled(category)
+    sid = quiz_session_store().create(question_ids, current_app.config['QUIZ_SESSION_TTL'])
+    return sid, len(question_ids)
+
+
+def next_session_question(sid):
+    """Next question of the quiz session, or None when the quiz is over. Raises KeyError for unknown sessions"""
+    store = quiz_session_store()
+    while True:
+        question_id = store.pop(sid)
+        if question_id is None:
+            return None
+        question = Question.query.get(question_id)
+        if question is not None:
+            return question
+        # Deleted since the quiz started, skip it
+
+
+# Keep the index in step with committed inserts and deletes
+
+@event.listens_for(RoutingSession, 'after_flush')
+def _track_questions(session, flush_context):
+    changes = session.info.setdefault('question_changes', [])
+    changes.extend(('add', obj.id, obj.category) for obj in session.new if isinstance(obj, Question))
+    changes.extend(('discard', obj.id, obj.category) for obj in session.deleted if isinstance(obj, Question))
+
+
+@event.listens_for(RoutingSession, 'after_commit')
+def _apply_question_changes(session):
+    changes = session.info.pop('question_changes', ())
+    index = current_app.extensions.get('question_index') if has_app_context() else None
+    if index is not None:
+        for change, question_id, category in changes:
+            getattr(index, change)(question_id, category)
+
+
+@event.listens_for(RoutingSession, 'after_rollback')
+def _discard_question_changes(session):
+    session.info.pop('question_changes', None)
@@ -0,0 +1,110 @@
+"""
+Question search.
+
+On Postgres, questions are searched through the `search_vector` column: a generated tsvector of the question (weight A)
+and answer (weight B) text, with a GIN index (see flaskr.models.SEARCH_VECTOR_DDL). All words of the search term must
+match, the last one as a prefix (so "sci" finds "science" while it is being typed), and results are ranked by ts_rank,
+best first. Questions of categories whose name matches the term are included too, ranked after the text matches. The
+`simple` text search configuration is used, so no words are dropped as stop words ("what is" still matches "What is
+science?").
+
+Ranking and counting read every matching row, so a search matching a large part of the question bank only ranks
+SEARCH_MAX_RESULTS of its matches, in no particular order, and its total is capped at that number. Such results are
+flagged as truncated: their ranking is best effort, the best matches may be missing from them.
+
+Other databases fall back to matching the term anywhere in the question, answer or category name with ILIKE.
+"""
+import re
+
+from flask import current_app
+from sqlalchemy import desc, func, literal_column, or_
+from sqlalchemy.dialects.postgresql import TSVECTOR
+
+from .models import Category, Question, db
+
+TEXT_SEARCH_CONFIG = 'simple'
+
+# Highlights wrap every matching word in the whole text, questions and answers are short
+HEADLINE_OPTIONS = 'StartSel=<mark>, StopSel=</mark>, HighlightAll=TRUE'
+
+search_vector = literal_column('questions.search_vector', type_=TSVECTOR)
+
+
+def _tsquery(search_term):
+    """Query matching all words of the search term, the last one as a prefix, None if it has no words"""
+    words = re.findall(r'[^\W_]+', search_term.lower())
+    if not words:
+        return None
+    return func.to_tsquery(TEXT_SEARCH_CONFIG, ' & '.join(words) + ':*')
+
+
+def _uses_text_search():
+    return db.engine.dialect.name == 'postgresql'
+
+
+def _matches(search_term, category_id):
+    """Query of every question matching `search_term` (within `category_id` if given), unordered, and the tsquery"""
+    questions = Question.query
+    if category_id:
+        questions = questions.filter(Question.category == category_id)
+
+    tsquery = _tsquery(search_term)
+    if tsquery is None:
+        return questions, None
+
+    # The categories table is small, match its names up front so the questions are filtered on indexed columns only
+    category_ids = [id_ for id_, in db.session.query(Category.id).filter(
+        func.to_tsvector(TEXT_SEARCH_CONFIG, Category.type).op('@@')(tsquery))]
+
+    matches = search_vector.op('@@')(tsquery)
+    if category_ids:
+        matches = or_(matches, Question.category.in_(category_ids))
+    return questions.filter(matches), tsquery
+
+
+def search_questions(search_term, category_id=None):
+    """Query of the questions matching `search_term` (within `category_id` if given), best match first"""
+    if not _uses_text_search():
+        questions = Question.query
+        if category_id:
+            questions = questions.filter(Question.category == category_id)
+        return questions.join(Category, Question.category == Category.id).filter(
+            Question.question.ilike(f'%{search_term}%')  # question contains
+            | Question.answer.ilike(f'%{search_term}%')  # answer contains
+            | Category.type.ilike(f'%{search_term}%')  # category contains
+        ).order_by(Question.id)
+
+    questions, tsquery = _matches(search_term, category_id)
+    if tsquery is None:
+        return questions.order_by(Question.id)
+
+    # Rank the first SEARCH_MAX_RESULTS matches only
+    candidates = questions.with_entities(Question.id).limit(current_app.config['SEARCH_MAX_RESULTS']).subquery()
+
+    return Question.query.filter(Question.id.in_(candidates)) \
+        .order_by(desc(func.ts_rank(search_vector, tsquery)), Question.id)
+
+
+def truncated(search_term, category_id, total):
+    """Whether a search of `total` results left matches out, see SEARCH_MAX_RESULTS"""
+    max_results = current_app.config['SEARCH_MAX_RESULTS']
+    if not _uses_text_search() or total < max_results:
+        return False
+    questions, tsquery = _matches(search_term, category_id)
+    if tsquery is None:
+        return False  # Listing every question, nothing is ranked or capped
+    return questions.with_entities(Question.id).offset(max_results).limit(1).first() is not None
+
+
+def highlights(questions, search_term):
+    """Question and answer text of `questions` with the words matching `search_term` marked, by question id"""
+    tsquery = _tsquery(search_term) if _uses_text_search() else None
+    if tsquery is None or not questions:
+        return {question.id: {'question': question.question, 'answer': question.answer} for question in questions}
+
+    rows = db.session.query(
+        Question.id,
+        func.ts_headline(TEXT_SEARCH_CONFIG, Question.question, tsquery, HEADLINE_OPTIONS),
+        func.ts_headline(TEXT_SEARCH_CONFIG, Question.answer, tsquery, HEADLINE_OPTIONS),
+    ).filter(Question.id.in_([question.id for question in questions]))
+    return {question_id: {'question': question, 'answer': answer} for question_id, question, answer in rows}
@@ -6,8 +6,10 @@ from flaskr.models import db, setup_db
 
 
 class BaseTestClass(TestCase):
+    config_class = TestConfig
+
     def setUp(self):
-        self.app = create_app(TestConfig)
+        self.app = create_app(self.config_class)
         self.client = self.app.test_client()
         self.app_context = self.app.app_context()
         self.app_context.push()
@@ -1,6 +1,8 @@
 import json
 from unittest.mock import patch
 
+from sqlalchemy import event
+
 from flaskr.models import Category, Question, db
 from .base import BaseTestClass
 
@@ -264,7 +266,8 @@ class TriviaApiTestCase(BaseTestClass):
             'questions': [
                 {'answer': 'Nobody knows', 'category': 1, 'difficulty': 5, 'id': 1, 'question': 'What is science?'}
             ],
-            'total_questions': 1
+            'total_questions': 1,
+            'truncated': False,
         }
 
         # Test question contains
@@ -275,7 +278,8 @@ class TriviaApiTestCase(BaseTestClass):
             'questions': [
                 {'answer': 'Nobody knows', 'category': 1, 'difficulty': 5, 'id': 1, 'question': 'What is science?'}
             ],
-            'total_questions': 1
+            'total_questions': 1,
+            'truncated': False,
         }
 
         # Test answer contains
@@ -287,7 +291,8 @@ class TriviaApiTestCase(BaseTestClass):
             'questions': [
                 {'answer': 'Nobody knows', 'category': 1, 'difficulty': 5, 'id': 1, 'question': 'What is science?'}
             ],
-            'total_questions': 1
+            'total_questions': 1,
+            'truncated': False,
         }
 
         # test within category
@@ -303,9 +308,64 @@ class TriviaApiTestCase(BaseTestClass):
                 {'answer': 'Nobody knows', 'category': 1, 'difficulty': 5, 'id': 1, 'question': 'What is science?'},
                 {'answer': 'Only Bill Nye knows', 'category': 1, 'difficulty': 5, 'id': 3, 'question': 'Why is science?'}
             ],
-            'total_questions': 2
+            'total_questions': 2,
+            'truncated': False,
         }
 
+    def test_categories_cached(self):
+        """Test that categories are served from memory until a category change is committed"""
+        statements = []
+        event.listen(db.engine, 'before_cursor_execute', lambda *args: statements.append(args[2]))
+
+        self.client.get('/api/categories')
+        statements.clear()
+        resp = self.client.get('/api/categories')
+        assert json.loads(resp.data) == {'categories': {'1': 'Science', '2': 'Geography'}}
+        assert not any('categories' in statement for statement in statements)
+
+        db.session.add(Category('History'))
+        db.session.commit()
+
+        resp = self.client.get('/api/categories')
+        assert json.loads(resp.data) == {'categories': {'1': 'Science', '2': 'Geography', '3': 'History'}}
+
+    def test_search_ranking(self):
+        """Test that searches match word prefixes, rank question matches first, and highlight matches on request"""
+        new_question = Question('Who knows geography?', 'Everyone', self.geography.id, 2)
+        new_question.insert()
+
+        resp = self.client.post('/api/questions/search', json={'searchTerm': 'kno', 'highlight': True})
+        assert resp.status_code == 200
+        resp_data = json.loads(resp.data)
+
+        # Question text matches rank above answer matches
+        assert [question['id'] for question in resp_data['questions']] == [new_question.id, self.science_question.id]
+        assert resp_data['total_questions'] == 2
+        assert resp_data['truncated'] is False
+        assert resp_data['highlights'] == {
+            str(new_question.id): {'question': 'Who <mark>knows</mark> geography?', 'answer': 'Everyone'},
+            str(self.science_question.id): {'question': 'What is science?', 'answer': 'Nobody <mark>knows</mark>'},
+        }
+
+    def test_search_truncated(self):
+        """Test that searches matching more than SEARCH_MAX_RESULTS questions are flagged as truncated"""
+        url = '/api/questions/search'
+        self.app.config['SEARCH_MAX_RESULTS'] = 1
+        Question('What is geography?', 'Maps', self.geography.id, 1).insert()
+
+        resp = self.client.post(url, json={'searchTerm': 'what'})
+        assert resp.status_code == 200
+        resp_data = json.loads(resp.data)
+        assert resp_data['total_questions'] == 1
+        assert resp_data['truncated'] is True
+
+        resp = self.client.post(url, json={'searchTerm': 'maps'})
+        assert json.loads(resp.data)['truncated'] is False
+
+        # Ranked results cannot be paginated by id
+        resp = self.client.post(f'{url}?after=0', json={'searchTerm': 'what'})
+        assert resp.status_code == 400
+
     def test_quiz_question_categorized(self):
         """Test get random quiz question from specific category"""
         url = '/api/quizzes'
@@ -379,3 +439,64 @@ class TriviaApiTestCase(BaseTestClass):
 
         resp_data = json.loads(resp.data)
         assert resp_data['question'] is None
+
+    def test_quiz_question_index_follows_writes(self):
+        """Test that the quiz serves questions added, and never questions deleted, after its index is loaded"""
+        url = '/api/quizzes'
+        data = {'previous_questions': [], 'quiz_category': self.science.id}
+
+        resp = self.client.post(url, json=data)
+        assert json.loads(resp.data)['question']['id'] == self.science_question.id
+
+        # Replace the only science question
+        new_question = Question('Why is science?', 'Only Bill Nye knows', self.science.id, 3)
+        new_question.insert()
+        self.science_question.delete()
+
+        for _ in range(5):
+            resp = self.client.post(url, json=data)
+            assert resp.status_code == 200
+            assert json.loads(resp.data)['question']['id'] == new_question.id
+
+        data['previous_questions'] = [new_question.id]
+        resp = self.client.post(url, json=data)
+        assert json.loads(resp.data)['question'] is None
+
+    def test_quiz_session(self):
+        """Test playing a quiz through a server-side quiz session"""
+        resp = self.client.post('/api/quizzes/sessions', json={'quiz_category': 0})
+        assert resp.status_code == 201
+        resp_data = json.loads(resp.data)
+        assert resp_data['total_questions'] == 2
+        url = f"/api/quizzes/sessions/{resp_data['quiz_session']}"
+
+        # Each question is asked once
+        asked = []
+        for _ in range(2):
+            resp = self.client.post(f'{url}/next')
+            assert resp.status_code == 200
+            asked.append(json.loads(resp.data)['question']['id'])
+        assert sorted(asked) == sorted([self.science_question.id, self.geog_question.id])
+
+        # Depleted questions
+        resp = self.client.post(f'{url}/next')
+        assert resp.status_code == 200
+        assert json.loads(resp.data)['question'] is None
+
+        # Ended session
+        resp = self.client.delete(url)
+        assert resp.status_code == 204
+        resp = self.client.post(f'{url}/next')
+        assert resp.status_code == 404
+
+    def test_quiz_session_skips_deleted_questions(self):
+        """Test that a quiz session skips questions deleted after it started"""
+        resp = self.client.post('/api/quizzes/sessions', json={'quiz_category': self.science.id})
+        resp_data = json.loads(resp.data)
+        assert resp_data['total_questions'] == 1
+
+        self.science_question.delete()
+
+        resp = self.client.post(f"/api/quizzes/sessions/{resp_data['quiz_session']}/next")
+        assert resp.status_code == 200
+        assert json.loads(resp.data)['question'] is None
@@ -0,0 +1,76 @@
+import json
+
+from sqlalchemy import event
+
+from config import TestConfig
+from flaskr.models import Category, Question, db
+from .base import BaseTestClass
+
+
+class ApproximateCountTestConfig(TestConfig):
+    PAGINATION_COUNT = 'approximate'
+
+
+class PaginationTestCase(BaseTestClass):
+
+    def setUp(self):
+        super().setUp()
+
+        self.science = Category('Science')
+        db.session.add(self.science)
+        db.session.commit()
+        self.questions = [Question(f'Science question {n}?', 'Nobody knows', self.science.id, 5) for n in range(5)]
+        for question in self.questions:
+            question.insert()
+
+        # Record the counts run
+        self.counts = []
+        event.listen(db.engine, 'before_cursor_execute', self._record_count)
+
+    def _record_count(self, conn, cursor, statement, parameters, context, executemany):
+        if 'count(' in statement:
+            self.counts.append(statement)
+
+    def test_counts_once_per_page(self):
+        """Test that a full page runs a single count and the last, partial, page none"""
+        resp = self.client.get(f'/api/categories/{self.science.id}/questions?page=1')
+        assert json.loads(resp.data)['total_questions'] == 5
+        assert len(self.counts) == 1
+
+        self.counts.clear()
+        resp = self.client.get(f'/api/categories/{self.science.id}/questions?page=3')
+        resp_data = json.loads(resp.data)
+        assert [question['id'] for question in resp_data['questions']] == [self.questions[4].id]
+        assert resp_data['total_questions'] == 5
+        assert self.counts == []
+
+    def test_keyset_pagination(self):
+        """Test paginating questions by the id of the last question seen"""
+        ids = []
+        after = 0
+        while after is not None:
+            resp = self.client.get(f'/api/questions?after={after}')
+            assert resp.status_code == 200
+            resp_data = json.loads(resp.data)
+            assert resp_data['total_questions'] == 5
+            ids.extend(question['id'] for question in resp_data['questions'])
+            after = resp_data['next_after']
+
+        assert ids == [question.id for question in self.questions]
+
+
+class ApproximateCountTestCase(PaginationTestCase):
+    config_class = ApproximateCountTestConfig
+
+    def test_filtered_counts_are_cached(self):
+        """Test that approximate filtered counts are reused across requests"""
+        url = '/api/questions/search'
+        for _ in range(2):
+            resp = self.client.post(url, json={'searchTerm': 'science'})
+            assert json.loads(resp.data)['total_questions'] == 5
+        assert len(self.counts) == 1
+
+    def test_small_table_counted_exactly(self):
+        """Test that small tables are counted exactly instead of estimated"""
+        resp = self.client.get('/api/questions')
+        assert json.loads(resp.data)['total_questions'] == 5
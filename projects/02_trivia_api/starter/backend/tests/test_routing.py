@@ -0,0 +1,89 @@
+import json
+
+from sqlalchemy import event, text
+
+from config import TestConfig
+from flaskr.models import Category, Question, db
+from .base import BaseTestClass
+
+
+class ReplicaTestConfig(TestConfig):
+    # The test database doubles as the replica, under its own engine
+    SQLALCHEMY_BINDS = {'replica_0': f'{TestConfig.SQLALCHEMY_DATABASE_URI}?application_name=replica'}
+
+
+class UnreachableReplicaTestConfig(TestConfig):
+    SQLALCHEMY_BINDS = {'replica_0': 'postgresql://postgres@127.0.0.1:1/trivia_test'}
+
+
+class ReplicaRoutingTestCase(BaseTestClass):
+    config_class = ReplicaTestConfig
+
+    def setUp(self):
+        super().setUp()
+
+        self.science = Category('Science')
+        db.session.add(self.science)
+        db.session.commit()
+        Question('What is science?', 'Nobody knows', self.science.id, 5).insert()
+
+        # Record the bind each statement is executed on
+        self.executed = []
+        for bind in [None, 'replica_0']:
+            event.listen(db.get_engine(self.app, bind=bind), 'before_cursor_execute', self._recorder(bind))
+
+    def _recorder(self, bind):
+        def record(conn, cursor, statement, parameters, context, executemany):
+            self.executed.append(bind or 'primary')
+        return record
+
+    def test_get_reads_from_replica(self):
+        """Test that GET requests read from the replica"""
+        resp = self.client.get('/api/categories')
+        assert resp.status_code == 200
+        assert json.loads(resp.data) == {'categories': {'1': 'Science'}}
+        assert set(self.executed) == {'replica_0'}
+
+    def test_post_reads_from_primary(self):
+        """Test that non GET requests read from the primary"""
+        resp = self.client.post('/api/questions/search', json={'searchTerm': 'science'})
+        assert resp.status_code == 200
+        assert set(self.executed) == {'primary'}
+
+    def test_reads_own_writes_from_primary(self):
+        """Test that a client reads from the primary for the lag window after a write"""
+        resp = self.client.post('/api/questions', json={
+            'question': 'Why is science?', 'answer': 'Only Bill Nye knows', 'category': self.science.id, 'difficulty': 3
+        })
+        assert resp.status_code == 200
+
+        self.executed.clear()
+        resp = self.client.get('/api/questions')
+        assert json.loads(resp.data)['total_questions'] == 2
+        assert set(self.executed) == {'primary'}
+
+        # Other clients keep reading from the replica
+        self.executed.clear()
+        self.app.test_client().get('/api/questions')
+        assert set(self.executed) == {'replica_0'}
+
+    def test_only_writes_start_lag_window(self):
+        """Test that read-only text() statements do not count as writes, unless marked as writing"""
+        with self.app.test_request_context('/api/questions'):
+            db.session.execute(text('SELECT 1'))
+            assert 'wrote' not in db.session.info
+
+            db.session.execute(text('UPDATE questions SET difficulty = 1').execution_options(writes=True))
+            assert db.session.info['wrote'] is True
+            db.session.rollback()
+
+
+class UnreachableReplicaTestCase(BaseTestClass):
+    config_class = UnreachableReplicaTestConfig
+
+    def test_unhealthy_replica_falls_back_to_primary(self):
+        """Test that reads go to the primary when no replica passes its health check"""
+        resp = self.client.get('/api/categories')
+        assert resp.status_code == 200
+        assert json.loads(resp.data) == {'categories': {}}
+        assert db.replicas._health['replica_0'][1] is False
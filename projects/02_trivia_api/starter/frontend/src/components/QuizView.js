@@ -10,6 +10,7 @@ class QuizView extends Component {
     super();
     this.state = {
         quizCategory: null,
+        quizSession: null,
         previousQuestions: [], 
         showAnswer: false,
         categories: {},
@@ -36,7 +37,27 @@ class QuizView extends Component {
   }
 
   selectCategory = ({type, id=0}) => {
-    this.setState({quizCategory: {type, id}}, this.getNextQuestion)
+    $.ajax({
+      url: '/api/quizzes/sessions',
+      type: "POST",
+      dataType: 'json',
+      contentType: 'application/json',
+      data: JSON.stringify({
+        quiz_category: id
+      }),
+      xhrFields: {
+        withCredentials: true
+      },
+      crossDomain: true,
+      success: (result) => {
+        this.setState({quizCategory: {type, id}, quizSession: result.quiz_session}, this.getNextQuestion)
+        return;
+      },
+      error: (error) => {
+        alert('Unable to start the quiz. Please try your request again')
+        return;
+      }
+    })
   }
 
   handleChange = (event) => {
@@ -47,16 +68,10 @@ class QuizView extends Component {
     const previousQuestions = [...this.state.previousQuestions]
     if(this.state.currentQuestion.id) { previousQuestions.push(this.state.currentQuestion.id) }
 
-    console.log(this.state.quizCategory);
     $.ajax({
-      url: '/api/quizzes', //TODO: update request URLq
+      url: `/api/quizzes/sessions/${this.state.quizSession}/next`,
       type: "POST",
       dataType: 'json',
-      contentType: 'application/json',
-      data: JSON.stringify({
-        previous_questions: previousQuestions,
-        quiz_category: this.state.quizCategory.id
-      }),
       xhrFields: {
         withCredentials: true
       },
@@ -91,6 +106,7 @@ class QuizView extends Component {
   restartGame = () => {
     this.setState({
       quizCategory: null,
+      quizSession: null,
       previousQuestions: [], 
       showAnswer: false,
       numCorrect: 0,
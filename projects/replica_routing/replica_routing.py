@@ -0,0 +1,148 @@
+"""
+Read replica routing for Flask-SQLAlchemy apps, shared by the fyyur and trivia backends.
+
+Replicas are configured as `replica_<n>` binds (the apps build them from DB_REPLICA_URIS). SELECTs of GET/HEAD requests
+are sent to one replica per request, chosen round robin among the healthy ones. Everything else goes to the primary:
+writes, sessions marked `session.info['primary'] = True` (the apps' `db_session` blocks) and any later reads in the same
+request, non GET requests, CLI commands and background jobs. After a request writes, the client reads from the primary
+for REPLICA_LAG_WINDOW seconds (tracked in its session cookie), so it sees its own writes even while the replicas lag
+behind.
+
+Replica health is checked at most every REPLICA_HEALTH_INTERVAL seconds: unreachable replicas, or replicas replaying
+more than REPLICA_MAX_LAG seconds behind the primary, are skipped until the next check.
+
+Only DML (and SELECT ... FOR UPDATE) counts as a write. Raw text() statements are run on the primary without starting
+the lag window, unless they are marked with `.execution_options(writes=True)`.
+"""
+import itertools
+import threading
+import time
+
+from flask import request, session as flask_session, has_request_context
+from flask_sqlalchemy import SQLAlchemy, SignallingSession, get_state
+from sqlalchemy import event, orm, text
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.sql.dml import UpdateBase
+from sqlalchemy.sql.elements import TextClause
+from sqlalchemy.sql.selectable import GenerativeSelect
+
+# Seconds the replica has been replaying behind the primary, 0 when it has replayed everything it received
+REPLICA_LAG = text("""
+SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+            ELSE coalesce(extract(epoch FROM now() - pg_last_xact_replay_timestamp()), 0) END
+""")
+
+READ_ONLY_METHODS = ('GET', 'HEAD')
+
+
+def replica_binds(uris):
+    """SQLALCHEMY_BINDS entries for a comma separated list of replica URIs"""
+    return {f'replica_{n}': uri.strip() for n, uri in enumerate(uris.split(',')) if uri.strip()}
+
+
+def is_write(clause):
+    """Whether a statement writes: INSERT/UPDATE/DELETE, SELECT ... FOR UPDATE, or text() marked `writes=True`"""
+    if isinstance(clause, UpdateBase):
+        return True
+    if isinstance(clause, GenerativeSelect):
+        return clause._for_update_arg is not None
+    if isinstance(clause, TextClause):
+        return clause.get_execution_options().get('writes', False)
+    return False
+
+
+class ReplicaSet(object):
+    """Round robin over the healthy replica binds"""
+
+    def __init__(self, keys, health_interval, max_lag):
+        self.keys = list(keys)
+        self.health_interval = health_interval
+        self.max_lag = max_lag
+        self._cycle = itertools.cycle(self.keys)
+        self._health = {}  # bind key: (checked at, healthy)
+        self._lock = threading.Lock()
+
+    def choose(self, db, app):
+        """Key of the next healthy replica, or None if there is none"""
+        for _ in self.keys:
+            with self._lock:
+                key = next(self._cycle)
+            if self.healthy(key, db.get_engine(app, bind=key)):
+                return key
+        return None
+
+    def healthy(self, key, engine):
+        with self._lock:
+            checked_at, healthy = self._health.get(key, (None, False))
+        if checked_at is None or time.monotonic() - checked_at > self.health_interval:
+            # Checked outside the lock, a slow replica must not hold up the others
+            healthy = self._check(engine)
+            with self._lock:
+                self._health[key] = (time.monotonic(), healthy)
+        return healthy
+
+    def _check(self, engine):
+        try:
+            with engine.connect() as connection:
+                lag = connection.execute(REPLICA_LAG).scalar()
+        except DBAPIError:
+            return False
+        return lag is None or lag <= self.max_lag
+
+
+class RoutingSession(SignallingSession):
+    def get_bind(self, mapper=None, clause=None):
+        db = get_state(self.app).db
+        if self._flushing or is_write(clause):
+            self.info['wrote'] = True
+        elif db.replicas.keys and self._reads_from_replica(clause):
+            if 'replica' not in self.info:
+                # One replica per session (i.e. per request), for a consistent view across its queries
+                self.info['replica'] = db.replicas.choose(db, self.app)
+            if self.info['replica'] is not None:
+                return db.get_engine(self.app, bind=self.info['replica'])
+        return super().get_bind(mapper, clause)
+
+    def _reads_from_replica(self, clause):
+        if not isinstance(clause, GenerativeSelect):
+            return False
+        if self.info.get('primary') or self.info.get('wrote'):
+            return False
+        if not has_request_context() or request.method not in READ_ONLY_METHODS:
+            return False
+        return flask_session.get('_primary_until', 0) < time.time()
+
+
+class RoutingSQLAlchemy(SQLAlchemy):
+    """SQLAlchemy with read replica routing, see RoutingSession"""
+
+    def init_app(self, app):
+        super().init_app(app)
+        keys = [key for key in app.config.get('SQLALCHEMY_BINDS') or {} if key.startswith('replica_')]
+        self.replicas = ReplicaSet(keys, app.config['REPLICA_HEALTH_INTERVAL'], app.config['REPLICA_MAX_LAG'])
+
+        @app.before_request
+        def reset_routing():
+            # Routing decisions are made per request, even if the session outlives one (e.g. a shared app context)
+            for key in ('primary', 'wrote', 'replica'):
+                self.session.info.pop(key, None)
+
+    def _execute_for_all_tables(self, app, bind, operation, skip_tables=False):
+        # Replicas receive their schema through replication, create_all/drop_all only run against the primary binds
+        if bind == '__all__':
+            binds = self.get_app(app).config.get('SQLALCHEMY_BINDS') or ()
+            bind = [None] + [key for key in binds if not key.startswith('replica_')]
+        super()._execute_for_all_tables(app, bind, operation, skip_tables)
+
+    def create_session(self, options):
+        return orm.sessionmaker(class_=RoutingSession, db=self, **options)
+
+
+@event.listens_for(RoutingSession, 'after_commit')
+def _start_lag_window(session):
+    if not session.info.pop('wrote', False):
+        return
+    session.info['primary'] = True  # Later reads of the request see the write
+    if get_state(session.app).db.replicas.keys and has_request_context():
+        # The client reads its own writes from the primary until the replicas have caught up
+        flask_session['_primary_until'] = time.time() + session.app.config['REPLICA_LAG_WINDOW']
@@ -0,0 +1,11 @@
+from setuptools import setup
+
+setup(
+    name='replica_routing',
+    version='1.0.0',
+    py_modules=['replica_routing'],
+    install_requires=[
+        'flask',
+        'flask-sqlalchemy',
+    ]
+)